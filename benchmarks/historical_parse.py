@@ -0,0 +1,37 @@
+"""
+Times historical_initalize against the original row-wise implementation on a synthetic
+station log and checks both return the same frame
+
+Run from the repo root: python -m benchmarks.historical_parse [rows]
+"""
+import sys
+import time
+import tempfile
+import os
+import pandas as pd
+import src.cleaning as cleaning
+from src.cleaning import historical_initalize, apply_schema, STATION_LOG_SCHEMA
+from tests.station_log import write_station_log, legacy_historical_initalize
+
+def timed(func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+def main(n_rows=200000):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_station_log(os.path.join(tmp, 'bikeshare_nyc_raw_jun2018.csv'), n_rows)
+        cleaning.HISTORICAL_FILEPATHS = [path]
+
+        legacy, legacy_seconds = timed(legacy_historical_initalize, [path])
+        vectorized, seconds = timed(historical_initalize)
+
+    legacy = apply_schema(legacy.reset_index(), STATION_LOG_SCHEMA).set_index(['station_id','date_time'])
+    pd.testing.assert_frame_equal(vectorized, legacy)
+
+    print(f'{n_rows} rows')
+    print(f'row-wise   {legacy_seconds:.2f}s')
+    print(f'vectorized {seconds:.2f}s ({legacy_seconds / seconds:.1f}x)')
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
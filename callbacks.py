@@ -1,21 +1,22 @@
 import dash_core_components as dcc
 import dash_bootstrap_components as dbc
 import dash_html_components as html
+from dash import callback_context
 from dash.dependencies import Input, Output
 from layouts import gcomponents
 from app import app
-from src.cleaning import station_initalize
+from src.live import LiveSnapshot
+from src.store import load_frame
 import json
 from datetime import datetime as dt
 
 from numpy import nan
-from pickle import load
 import plotly.express as px
 
 ### Load in data accessed by callbacks
-live = station_initalize()
-system_daily = load(open('./data/pickle/system_daily.pickle','rb'))
-system_forcast = load(open('./data/pickle/system_forcast.pickle','rb'))
+live_snapshot = LiveSnapshot().start()
+system_daily = load_frame('system_daily')
+system_forcast = load_frame('system_forcast')
 
 @app.callback(
     Output("tab-content", "children"),
@@ -33,68 +34,67 @@ def render_tab_content(active_tab):
             return dcc.Graph(figure=gcomponents['week_heat'])
     return "No tab selected"
 
+@app.callback(
+    Output("station-results","options"),
+    Input("station-search","value")
+)
+def search_stations(query):
+    """
+    This callback lists the best matching stations for the text typed in the station search box
+    """
+    if not query:
+        return []
+    return [{'label':name, 'value':str(station_id)}
+            for station_id, name, _ in gcomponents['station_search'].search(query, limit=8)]
+
+def selected_station(click_data, search_value):
+    """
+    Returns (station_id, name, lat, lon) of the station picked most recently, either by
+    clicking the cluster map or from the search results
+    """
+    triggered = [t['prop_id'] for t in callback_context.triggered]
+    if search_value and 'station-results.value' in triggered:
+        name, lat, lon = gcomponents['station_lookup'][search_value]
+        return search_value, name, lat, lon
+
+    point = click_data['points'][0]
+    return point['customdata'][0], point['hovertext'], point['lat'], point['lon']
+
 @app.callback(
     Output("station-content","children"),
-    Input("station-map","clickData")
+    Input("station-map","clickData"),
+    Input("station-results","value")
 )
-def basic_content(click_data):
+def basic_content(click_data, search_value):
     """
     This call back generates live individual station information from cursor click
-    on the station cluster map
+    on the station cluster map or a station search result
     """
-    name = click_data['points'][0]['hovertext']
-    station_id = click_data['points'][0]['customdata'][0]
-    lat = click_data['points'][0]['lat']
-    lon = click_data['points'][0]['lon']
+    station_id, name, lat, lon = selected_station(click_data, search_value)
     status = 'Active'
 
     # try live station data, if doesn't exist, pass no longer in use
-
-    try:
-        capacity = live.loc[live.station_id == int(station_id)].capacity.values[0]
-    except:
-        capacity = ''
+    record = live_snapshot.registry.get(station_id)
+    if record is None:
+        record = {}
         status = 'Station no longer in Use'
 
-    try:
-        avail_bikes = live.loc[live.station_id == int(station_id)].num_bikes_available.values[0]
-    except:    
-        avail_bikes = ''
-    
-    try:
-        avail_docks = live.loc[live.station_id == int(station_id)].num_docks_available.values[0]
-    except:    
-        avail_docks = ''
-    
-    try:
-        disabled_bikes = live.loc[live.station_id == int(station_id)].num_bikes_disabled.values[0]
-    except:
-        disabled_bikes = '' 
-
-    try:   
-        disabled_docks = live.loc[live.station_id == int(station_id)].num_docks_disabled.values[0]
-    except:    
-        disabled_docks = ''
-        
-    try:
-        action = live.loc[live.station_id == int(station_id)].bike_angels_action.values[0]
-    except:
-        action = ''
-
-    try:       
-        points = abs(live.loc[live.station_id == int(station_id)].bike_angels_points.values[0])
-    except:
-        points = ''   
+    capacity = record.get('capacity', '')
+    avail_bikes = record.get('num_bikes_available', '')
+    avail_docks = record.get('num_docks_available', '')
+    disabled_bikes = record.get('num_bikes_disabled', '')
+    disabled_docks = record.get('num_docks_disabled', '')
+    action = record.get('bike_angels_action', '')
+    points = abs(record['bike_angels_points']) if 'bike_angels_points' in record else ''
         
     try:
         percent = avail_bikes / (capacity - disabled_bikes - disabled_docks)
     except:
         percent = nan   
         
-        
-    try:
-        updated = dt.fromtimestamp(live.loc[live.station_id == int(station_id)].last_reported.values[0]).strftime('%a, %b %d, %Y %I:%M %p')
-    except:
+    if 'last_reported' in record:
+        updated = dt.fromtimestamp(record['last_reported']).strftime('%a, %b %d, %Y %I:%M %p')
+    else:
         updated = 'December 2018'
 
     #### Component layouts
@@ -144,13 +144,14 @@ def basic_content(click_data):
 
 @app.callback(
     Output("daily-graph","children"),
-    Input("station-map","clickData")
+    Input("station-map","clickData"),
+    Input("station-results","value")
 )
-def render_graphs(click_data):
+def render_graphs(click_data, search_value):
     """
-    Generates Daily Seasonality graph and time series graph based on clicked station
+    Generates Daily Seasonality graph and time series graph based on clicked or searched station
     """
-    station_id = click_data['points'][0]['customdata'][0]
+    station_id = selected_station(click_data, search_value)[0]
 
     #### Daily Seasonality graph
 
@@ -174,8 +175,9 @@ def render_graphs(click_data):
     forcast.update_layout(margin=dict(l=5,r=5,t=5,b=5),showlegend=False)
     forcast.update_yaxes(title='Number of Bikes')
     forcast.update_xaxes(title='', dtick='d1',tickformat='%a')
-    try:
-        capacity = live.loc[live.station_id == int(station_id)].capacity.values[0]
+    record = live_snapshot.registry.get(station_id)
+    if record is not None:
+        capacity = record['capacity']
         forcast.add_shape(type='line',
                         x0=0,
                         x1=1,
@@ -184,8 +186,6 @@ def render_graphs(click_data):
                         line={'color':'red'},
                         xref='paper',
                         yref='y')
-    except:
-        pass
     
 
     ### Forcast Time Series Graph 
@@ -10,12 +10,16 @@ import boto3
 import pandas as pd
 import json
 from pickle import load
+from src.store import load_frame
+from src.flow_cube import load_flow_cube
+from src.search import StationNameIndex
 
 #####################################
 # Data
 #####################################
 
-starts = load(open('./data/starts.pickle','rb'))
+trips = load_frame('trips', columns=['tripduration'])
+flow_cube = load_flow_cube()
 animation_data = load(open('./data/june17_slice.pickle','rb'))
 clusters = load(open('./data/clusters.pickle','rb'))
 
@@ -72,13 +76,13 @@ def nav_bar():
 
 #### Weekday vs Weekend ####
 
-#separate trips into weekdays and weekends
-weekdays = starts[starts.weekday==True].droplevel(level=-2)
-weekends = starts[starts.weekday==False].droplevel(level=-2)
+#system wide departures per 15 minutes from the flow cube, separated into weekdays and weekends
+departures = flow_cube.totals('departures')
+weekdays = departures[departures.index.dayofweek<5]
+weekends = departures[departures.index.dayofweek>=5]
 
-ww = pd.concat([weekdays.groupby(weekdays.index.hour).size()/52/5,weekends.groupby(weekends.index.hour).size()/52/2],
-              axis=1)
-ww.rename(columns={0:'weekdays',1:'weekends'}, inplace=True)
+ww = pd.concat([weekdays.groupby(weekdays.index.hour).sum()/52/5,weekends.groupby(weekends.index.hour).sum()/52/2],
+              axis=1, keys=['weekdays','weekends'])
 
 week_line = go.Figure()
 week_line.add_trace(go.Scatter(y=ww.weekdays,mode='lines',fill='tozeroy',name='Weekdays'))
@@ -98,8 +102,7 @@ week_line.update_layout(
 
 #### Weekly heatmap ####
 
-starts_by_weekday = starts.droplevel(level=-2)
-starts_by_weekday = starts_by_weekday.groupby([starts_by_weekday.index.hour,'day_of_week']).size().unstack().transpose()
+starts_by_weekday = departures.groupby([departures.index.hour,departures.index.dayofweek]).sum().unstack().transpose()
 
 week_heat = px.imshow(starts_by_weekday,color_continuous_scale='hot')
 week_heat.update_layout(
@@ -162,9 +165,16 @@ cluster_map.update_layout(
     )
 
 
+#### Station search ####
+
+#name index and (name, lat, lon) lookup over the mapped stations
+station_search = StationNameIndex(clusters.station_name.values, clusters.station_id.values)
+station_lookup = {str(row.station_id):(row.station_name, row._lat, row._long) for row in clusters.itertuples()}
+
+
 #### Histogram of trip duration ####
 
-duration = starts.tripduration/60
+duration = trips.tripduration/60
 
 duration_hist = px.histogram(duration, x='tripduration',range_x=[0,90], height=250)
 
@@ -191,7 +201,9 @@ duration_hist.add_shape(type='line',
 #### Storing components for later use in callbacks.py####
 
 gcomponents = {'week_line':week_line,
-                'week_heat':week_heat,}
+                'week_heat':week_heat,
+                'station_search':station_search,
+                'station_lookup':station_lookup,}
 
 
 #####################################
@@ -252,6 +264,11 @@ station_layout = html.Div(
                             [
                                 html.H4('Station Map (2018)'),
                                 html.Hr(),
+                                dcc.Input(id='station-search', type='search',
+                                        placeholder='Search stations (ex. Columbus & W 74)',
+                                        style={'width':'100%'}),
+                                dcc.RadioItems(id='station-results', options=[],
+                                        labelStyle={'display':'block','font-size':'14px'}),
                                 dcc.Graph(figure=cluster_map,
                                         id='station-map',
                                         clickData={'points':[{
@@ -0,0 +1,232 @@
+import pandas as pd
+import numpy as np
+import os
+import glob
+from src.cleaning import SEASONS
+
+#root of the live status archive, partitioned by day as <ARCHIVE_DIR>/YYYY-MM-DD/
+ARCHIVE_DIR = 'data/live_archive'
+
+#timezone of the system, archive partitions and returned date_time are local
+TIMEZONE = 'America/New_York'
+
+#live columns archived on every change -> archive column, dtype
+STATUS_COLUMNS = {'num_bikes_available':('avail_bikes','int16'),
+                  'num_docks_available':('avail_docks','int16'),
+                  'num_bikes_disabled':('disabled_bikes','int16'),
+                  'num_docks_disabled':('disabled_docks','int16')}
+
+def _partition(timestamp):
+    """
+    Returns local date partition name of an epoch seconds timestamp
+    """
+    return pd.Timestamp(timestamp, unit='s', tz='UTC').tz_convert(TIMEZONE).strftime('%Y-%m-%d')
+
+class ArchiveWriter(object):
+    """
+    Append only archive of live station status
+
+    Only stations whose status columns changed since the last poll are buffered, so a
+    station that sits unchanged for hours costs one row (run-length encoding over polls).
+    Buffers are flushed as compressed .npz chunks sorted by station, with each station's
+    report times stored as deltas. Each partition opens with the status of every station,
+    so a day can be read without earlier partitions. Static station metadata is written once
+    per partition and only rewritten when it changes
+    """
+
+    def __init__(self, archive_dir=ARCHIVE_DIR, flush_rows=50000):
+        self.archive_dir = archive_dir
+        self.flush_rows = flush_rows
+        self.last = None
+        self.buffer = []
+        self.buffer_rows = 0
+        self.partition = None
+        self.stations = None
+
+    def append(self, live_df):
+        """
+        Appends the changed rows of a live snapshot (see cleaning.station_initalize)
+        """
+        live_df = live_df.set_index('station_id').sort_index()
+        status = pd.DataFrame({name:live_df[col].astype(dtype) for col, (name, dtype) in STATUS_COLUMNS.items()})
+        status['last_reported'] = live_df.last_reported.astype(np.int64)
+
+        partition = _partition(int(status.last_reported.max()))
+        if partition != self.partition:
+            self.flush()
+            self.partition = partition
+            self.stations = None
+            #open the partition with every station's status
+            self.last = None
+
+        self._write_stations(live_df)
+
+        #keep only stations that are new or whose status changed
+        if self.last is not None:
+            previous = self.last.reindex(status.index)
+            values = [name for name, _ in STATUS_COLUMNS.values()]
+            changed = previous[values].isna().any(axis=1) | (previous[values] != status[values]).any(axis=1)
+            rows = status.loc[changed.values]
+        else:
+            rows = status
+        self.last = status
+
+        if len(rows):
+            self.buffer.append(rows)
+            self.buffer_rows += len(rows)
+        if self.buffer_rows >= self.flush_rows:
+            self.flush()
+
+        return len(rows)
+
+    def _write_stations(self, live_df):
+        stations = live_df[['station_name','lat','lon','capacity']]
+        if self.stations is not None and self.stations.equals(stations):
+            return
+        self.stations = stations
+
+        path = os.path.join(self.archive_dir, self.partition)
+        os.makedirs(path, exist_ok=True)
+        stations.reset_index().to_json(os.path.join(path, 'stations.json'), orient='records')
+
+    def flush(self):
+        """
+        Writes buffered rows as one compressed chunk in the current partition
+        """
+        if not self.buffer:
+            return
+        rows = pd.concat(self.buffer).reset_index().sort_values(['station_id','last_reported'], kind='mergesort')
+        self.buffer = []
+        self.buffer_rows = 0
+
+        times = rows.last_reported.values
+        station_ids = rows.station_id.values
+
+        #first report time, then per row deltas that restart at every station
+        deltas = np.diff(times, prepend=times[0])
+        deltas[np.r_[True, station_ids[1:] != station_ids[:-1]]] = 0
+        firsts = times[np.r_[True, station_ids[1:] != station_ids[:-1]]]
+
+        path = os.path.join(self.archive_dir, self.partition)
+        os.makedirs(path, exist_ok=True)
+        chunk = os.path.join(path, f'chunk_{int(times.max())}_{os.getpid()}.npz')
+        np.savez_compressed(chunk,
+                            station_id=station_ids.astype(np.uint16),
+                            first_reported=firsts.astype(np.int64),
+                            delta_reported=deltas.astype(np.int32),
+                            **{name:rows[name].values.astype(dtype) for name, dtype in STATUS_COLUMNS.values()})
+
+def _read_chunk(path):
+    """
+    Decodes one archive chunk into a DataFrame
+    """
+    chunk = np.load(path)
+    station_ids = chunk['station_id'].astype(np.int64)
+    starts = np.r_[True, station_ids[1:] != station_ids[:-1]]
+
+    #undo delta encoding: cumulative sum within each station run plus that station's first time
+    run = np.cumsum(starts) - 1
+    cum = np.cumsum(chunk['delta_reported'].astype(np.int64))
+    times = chunk['first_reported'][run] + cum - cum[np.flatnonzero(starts)][run]
+
+    df = pd.DataFrame({'station_id':station_ids, 'last_reported':times})
+    for name, dtype in STATUS_COLUMNS.values():
+        df[name] = chunk[name]
+    return df
+
+def _read_partition(archive_dir, day):
+    """
+    Returns (status rows with local date_time, station metadata) of one day partition,
+    either None if the partition has no such file
+    """
+    path = os.path.join(archive_dir, day)
+    chunks = [_read_chunk(chunk) for chunk in sorted(glob.glob(os.path.join(path, 'chunk_*.npz')))]
+
+    rows = None
+    if chunks:
+        rows = pd.concat(chunks)
+        rows['date_time'] = pd.to_datetime(rows.last_reported, unit='s', utc=True) \
+            .dt.tz_convert(TIMEZONE).dt.tz_localize(None)
+
+    stations = None
+    if os.path.exists(os.path.join(path, 'stations.json')):
+        stations = pd.read_json(os.path.join(path, 'stations.json'), orient='records')
+    return rows, stations
+
+def _latest(rows, before):
+    """
+    Returns each station's last row at or before a time
+    """
+    rows = rows.loc[rows.date_time <= before].sort_values(['station_id','last_reported'], kind='mergesort')
+    return rows.drop_duplicates('station_id', keep='last')
+
+def read_archive(start, end, archive_dir=ARCHIVE_DIR, resample=None, lookback=7):
+    """
+    Returns archived live status between start and end as a multiindex (station_id, date_time)
+    DataFrame shaped like cleaning.historical_initalize
+
+    The archive only holds status changes, so every station starts with a row at start carrying
+    its last status reported at or before start, found in earlier partitions if needed
+
+    ---Params---
+
+    start, end: str or datetime-like, local time range to read
+
+    resample: str, pandas frequency string, if given each station is put on a regular grid from
+              start to end with its last reported status carried forward, otherwise one row per
+              status change
+
+    lookback: int, max number of days before start searched for stations' last status
+    """
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    days = pd.date_range(start.normalize(), end.normalize(), freq='D').strftime('%Y-%m-%d')
+
+    frames = []
+    stations = []
+    for day in days:
+        rows, day_stations = _read_partition(archive_dir, day)
+        frames += [] if rows is None else [rows]
+        stations += [] if day_stations is None else [day_stations]
+    if not frames and not stations:
+        return pd.DataFrame()
+
+    ts_stations = pd.concat(frames) if frames else pd.DataFrame(columns=['station_id','last_reported','date_time'])
+    seeds = [_latest(ts_stations, start)]
+
+    #stations without a report at or before start in the window, searched day by day back
+    known = set(ts_stations.station_id).union(*[set(df.station_id) for df in stations])
+    missing = known.difference(seeds[0].station_id)
+    for day in pd.date_range(end=start.normalize() - pd.Timedelta(days=1), periods=lookback, freq='D')[::-1]:
+        if not missing:
+            break
+        rows, day_stations = _read_partition(archive_dir, day.strftime('%Y-%m-%d'))
+        if day_stations is not None:
+            stations.insert(0, day_stations)
+        if rows is None:
+            continue
+        seed = _latest(rows.loc[rows.station_id.isin(missing)], start)
+        seeds.append(seed)
+        missing = missing.difference(seed.station_id)
+
+    seeds = pd.concat(seeds)
+    seeds['date_time'] = start
+    ts_stations = pd.concat([seeds, ts_stations.loc[(ts_stations.date_time > start) & (ts_stations.date_time <= end)]])
+
+    #station metadata, latest partition wins
+    stations = pd.concat(stations).drop_duplicates('station_id', keep='last').set_index('station_id')
+    stations.rename(columns={'lat':'_lat','lon':'_long','capacity':'tot_docks'}, inplace=True)
+    ts_stations = ts_stations.join(stations, on='station_id')
+
+    ts_stations = ts_stations.drop(columns=['last_reported']) \
+        .set_index(['station_id','date_time']).sort_index()
+    ts_stations = ts_stations[~ts_stations.index.duplicated(keep='last')]
+
+    if resample is not None:
+        grid = pd.date_range(start.floor(resample), end, freq=resample, name='date_time')
+        ts_stations = ts_stations.groupby(level='station_id') \
+            .apply(lambda x: x.droplevel(0).resample(resample).last().reindex(grid).ffill())
+
+    ts_stations['percent_full'] = ts_stations.avail_bikes/ts_stations.tot_docks
+    ts_stations['season'] = SEASONS[ts_stations.index.get_level_values('date_time').month.values]
+
+    return ts_stations
@@ -1,49 +1,76 @@
 #!/usr/bin/python3
+"""
+Collects live station status into the append only live archive (see src.archive)
 
-import requests
-import json
-import numpy as np
-import pandas as pd
-from datetime import datetime
-
-#get feed links
-url = 'http://gbfs.citibikenyc.com/gbfs/gbfs.json'
-response = requests.get(url)
-
-#create dictionary of links
-citibike_feed = json.loads(response.text)['data']['en']['feeds']
-feed_dict = {i['name']:i['url'] for i in citibike_feed}
-feed_dict['bike_angels'] = 'https://layer.bicyclesharing.net/map/v1/nyc/stations'
-feed_dict
-
-#get JSONs from links
-station_information = json.loads(requests.get(feed_dict['station_information']).text)['data']['stations']
-station_status = json.loads(requests.get(feed_dict['station_status']).text)['data']['stations']
-angels = json.loads(requests.get(feed_dict['bike_angels']).text)['features']
-
-#create dataframes
-status_df = pd.DataFrame(station_status)
-stations_df = pd.DataFrame(station_information)
-
-angels_df = pd.DataFrame([i['properties'] for i in angels])
-angels_df = angels_df[['station_id','bike_angels_action', 'bike_angels_points',
-       'bike_angels_digits']]
-
-#combine dataframes and some cleaning
-df = pd.merge(stations_df,status_df,on='station_id')
-df = pd.merge(df,angels_df,on='station_id')
-
-conditions = [
-    df.bike_angels_action.isna() == True,
-    df.bike_angels_action == 'neutral',
-    df.bike_angels_action == 'give',
-    df.bike_angels_action == 'take',
-]
-
-choices = [0,0,df.bike_angels_points,df.bike_angels_points*(-1)]
-
-df.bike_angels_points = np.select(conditions,choices,df.bike_angels_points)
-
-#save to csv
-path = '~/Desktop/live_data/bike_data_' + datetime.now().strftime('%m-%d-%y_%H-%M') + '.csv'
-df.to_csv(path)
\ No newline at end of file
+Run from the project root as a long running process:
+
+    python -m src.bikecron
+"""
+
+import time
+import logging
+from src.live import LiveStationTable
+from src.archive import ArchiveWriter, ARCHIVE_DIR
+
+logger = logging.getLogger(__name__)
+
+class SnapshotCollector(object):
+    """
+    Polls the live feed at its ttl and appends changed station status to the archive
+    """
+
+    def __init__(self, archive_dir=ARCHIVE_DIR, min_interval=10, retry_interval=30, flush_interval=900):
+        """
+        ---Params---
+
+        archive_dir: str, root of the live archive
+
+        min_interval: float, minimum seconds between polls regardless of feed ttl
+
+        retry_interval: float, seconds to wait after a failed poll
+
+        flush_interval: float, max seconds buffered rows are held before being written
+        """
+        self.table = LiveStationTable()
+        self.writer = ArchiveWriter(archive_dir)
+        self.min_interval = min_interval
+        self.retry_interval = retry_interval
+        self.flush_interval = flush_interval
+
+    def poll(self):
+        """
+        Fetches one snapshot, appends its changes and returns seconds until the next poll
+        """
+        live_df = self.table.update()
+        changed = self.writer.append(live_df)
+        logger.info('%s stations changed', changed)
+        return max(live_df.attrs.get('ttl', 0), self.min_interval)
+
+    def run(self):
+        """
+        Polls until interrupted, flushing buffered rows on exit
+        """
+        last_flush = time.monotonic()
+        try:
+            while True:
+                started = time.monotonic()
+                try:
+                    wait = self.poll()
+                except Exception:
+                    logger.exception('poll failed')
+                    wait = self.retry_interval
+
+                if time.monotonic() - last_flush >= self.flush_interval:
+                    self.writer.flush()
+                    last_flush = time.monotonic()
+
+                time.sleep(max(wait - (time.monotonic() - started), 0))
+        finally:
+            self.writer.flush()
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    SnapshotCollector().run()
+
+if __name__ == '__main__':
+    main()
@@ -1,35 +1,67 @@
 import pandas as pd
 import numpy as np
-import requests
 import json
 import datetime as dt
 import pickle
+import os
+import hashlib
+import logging
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from src.store import save_frame
+from src.trip_index import TripIndex, TRIP_INDEX_COLUMNS
+from src.flow_cube import FlowCube
+from src.gbfs import fetch_feeds, get_feed_dict, get_regions, TIMEOUT
 
+logger = logging.getLogger(__name__)
 
-#retrieve data links from citibike
-url = 'http://gbfs.citibikenyc.com/gbfs/gbfs.json'
-response = requests.get(url)
 
-#retrieve json from citibike and load relevant information
-citibike_feed = json.loads(response.text)['data']['en']['feeds']
-feed_dict = {i['name']:i['url'] for i in citibike_feed}
-feed_dict['bike_angels'] = 'https://layer.bicyclesharing.net/map/v1/nyc/stations'
-
-regions_raw = json.loads(requests.get(feed_dict['system_regions']).text)['data']['regions']
-#reformat region
-regions = {}
-for region in regions_raw:
-    regions[region['region_id']] = region['name']
+def __getattr__(name):
+    """
+    Resolves feed_dict and regions lazily so importing this module does no network I/O
+    """
+    if name == 'feed_dict':
+        return get_feed_dict()
+    if name == 'regions':
+        return get_regions()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-def station_initalize():
+def station_initalize(timeout=TIMEOUT):
     """
     Initalizes DataFrame of stations with most current information
+
+    ---Params---
+
+    timeout: float or (connect, read) tuple, per request timeout in seconds
     """
-    #requests and reads json from CitiBike
-    station_information = json.loads(requests.get(feed_dict['station_information']).text)['data']['stations']
-    station_status = json.loads(requests.get(feed_dict['station_status']).text)['data']['stations']
-    angels = json.loads(requests.get(feed_dict['bike_angels']).text)['features']
+    #requests station information, status and bike angels concurrently from CitiBike
+    feeds = fetch_feeds(get_feed_dict(), ['station_information','station_status','bike_angels'], timeout)
+
+    live_df = merge_live(feeds['station_information']['data']['stations'],
+                         feeds['station_status']['data']['stations'],
+                         feeds['bike_angels']['features'])
+
+    #feed freshness, used to schedule refreshes
+    live_df.attrs['ttl'] = feeds['station_status'].get('ttl', 0)
+    live_df.attrs['last_updated'] = feeds['station_status'].get('last_updated')
     
+    return live_df
+
+def merge_live(station_information, station_status, angels, drop_out_of_service=True, keep_unmatched=False):
+    """
+    Joins station information, station status and bike angels feed records into one DataFrame
+
+    ---Params---
+
+    station_information, station_status: list of dict, 'stations' records of each GBFS feed
+
+    angels: list of dict, 'features' records of the bike angels layer
+
+    drop_out_of_service: bool, if True drops stations with station_status 'out_of_service'
+
+    keep_unmatched: bool, if True keeps every station_status station, leaving information and
+                    bike angels columns empty where those feeds have no record of it
+    """
     #convert to dataframe
     status_df = pd.DataFrame(station_status)
     stations_df = pd.DataFrame(station_information)
@@ -39,37 +71,37 @@ def station_initalize():
            'bike_angels_digits']]
 
     #join into one dataframe
-    live_df = pd.merge(stations_df,status_df,on='station_id')
-    live_df = pd.merge(live_df,angels_df,on='station_id')
-    live_df.drop(labels=list(live_df.loc[live_df.station_status == 'out_of_service'].index), inplace=True)
+    live_df = pd.merge(stations_df,status_df,on='station_id',how='right' if keep_unmatched else 'inner')
+    live_df = pd.merge(live_df,angels_df,on='station_id',how='left' if keep_unmatched else 'inner')
+    if drop_out_of_service:
+        live_df.drop(labels=list(live_df.loc[live_df.station_status == 'out_of_service'].index), inplace=True)
     
     live_df.station_id = live_df.station_id.astype(int)
 
-    #give direction to bike angle point valies
-    conditions = [
-        live_df.bike_angels_action.isna() == True,
-        live_df.bike_angels_action == 'neutral',
-        live_df.bike_angels_action == 'give',
-        live_df.bike_angels_action == 'take',
-    ]
-    
-    #negative value for take out positive value for take in
-    choices = [0,0,live_df.bike_angels_points,live_df.bike_angels_points*(-1)]
-
-    live_df.bike_angels_points = np.select(conditions,choices,live_df.bike_angels_points)
+    live_df.bike_angels_points = angel_points(live_df.bike_angels_action, live_df.bike_angels_points)
 
     #rename name column
     live_df.rename(columns={'name':'station_name'},inplace=True)
-    
+
     return live_df
 
-def trip_initialize():
+def angel_points(action, points):
     """
-    Reads Trip data and returns two time series by start station and end station
-    *** Currently only 2018 ***
+    Gives direction to bike angel point values: negative value for take out, positive value for take in
     """
-    #read trips
-    filepaths = ['data/trip_data/201801-citibike-tripdata.csv',
+    conditions = [
+        action.isna() == True,
+        action == 'neutral',
+        action == 'give',
+        action == 'take',
+    ]
+    
+    choices = [0,0,points,points*(-1)]
+
+    return np.select(conditions,choices,points)
+
+#monthly trip files
+TRIP_FILEPATHS = ['data/trip_data/201801-citibike-tripdata.csv',
                 'data/trip_data/201802-citibike-tripdata.csv',
                 'data/trip_data/201803-citibike-tripdata.csv',
                 'data/trip_data/201804-citibike-tripdata.csv',
@@ -82,10 +114,111 @@ def trip_initialize():
                 'data/trip_data/201811-citibike-tripdata.csv',
                 'data/trip_data/201812-citibike-tripdata.csv',]
 
-    trip_dfs = [pd.read_csv(path) for path in filepaths]
+#compact dtypes applied at ingest
+TRIP_SCHEMA = {'tripduration':'int32',
+               'start_station_id':'uint16',
+               'start_station_name':'category',
+               'start_station_latitude':'float32',
+               'start_station_longitude':'float32',
+               'end_station_id':'uint16',
+               'end_station_name':'category',
+               'end_station_latitude':'float32',
+               'end_station_longitude':'float32',
+               'bikeid':'int32',
+               'usertype':'category',
+               'birth_year':'uint16',
+               'gender':'uint8',
+               'day_of_week':'uint8',
+               'weekday':'bool'}
+
+STATION_LOG_SCHEMA = {'station_id':'uint16',
+                      'station_name':'category',
+                      'avail_bikes':'int16',
+                      'avail_docks':'int16',
+                      'tot_docks':'int16',
+                      '_lat':'float32',
+                      '_long':'float32',
+                      'percent_full':'float32',
+                      'season':'category'}
+
+#ends only needs to answer arrival counts, so it does not carry a second copy of every trip column
+ENDS_COLUMNS = ['end_station_id','stoptime','start_station_id','tripduration','day_of_week','weekday']
+
+def apply_schema(df, schema, categories=True):
+    """
+    Casts columns of df to the compact dtypes in schema, columns not in df are skipped.
+    Integer columns with nulls or values outside the target range keep their dtype
 
-    trips = pd.concat(trip_dfs)
-    
+    ---Params---
+
+    df: pandas DataFrame
+
+    schema: dict, {column: dtype}
+
+    categories: bool, if False category columns are left as is, used when frames will be
+                concatenated later since categoricals with different categories concat to object
+    """
+    for col, dtype in schema.items():
+        if col not in df.columns:
+            continue
+        if dtype == 'category':
+            if categories:
+                df[col] = df[col].astype('category')
+            continue
+
+        dtype = np.dtype(dtype)
+        if dtype.kind in 'iu':
+            values = df[col]
+            if len(values) and (values.isna().any() or values.min() < np.iinfo(dtype).min
+                                or values.max() > np.iinfo(dtype).max):
+                continue
+        df[col] = df[col].astype(dtype)
+
+    return df
+
+def default_memory_usage(df, schema):
+    """
+    Returns deep memory usage in bytes df would have with the default dtypes pandas reads it with:
+    64 bit numbers for the schema's numeric columns and python strings for its categories.
+    Computed from df's values without building the default frame
+    """
+    usage = df.memory_usage(deep=True)
+    for col, dtype in schema.items():
+        if col not in df.columns:
+            continue
+        values = df[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            #one object pointer per row plus the python string it points to
+            sizes = np.array([sys.getsizeof(category) for category in values.cat.categories])
+            codes = values.cat.codes.values
+            counts = np.bincount(codes[codes >= 0], minlength=len(sizes))
+            usage[col] = 8 * len(values) + int(counts @ sizes)
+        elif dtype != 'category' and np.dtype(dtype).kind in 'iuf':
+            usage[col] = 8 * len(values)
+    return int(usage.sum())
+
+def memory_report(frames):
+    """
+    Returns DataFrame of deep memory usage in MB of each artifact with default dtypes and with its
+    compact schema
+
+    ---Params---
+
+    frames: dict, {name: (DataFrame with its compact schema applied, schema)}
+    """
+    report = {}
+    for name, (df, schema) in frames.items():
+        before = default_memory_usage(df, schema)
+        after = df.memory_usage(deep=True).sum()
+        report[name] = {'before_mb':before/1e6, 'after_mb':after/1e6, 'ratio':after/before}
+
+    return pd.DataFrame(report).transpose()
+
+def clean_trips(trips):
+    """
+    Cleans a raw trip DataFrame (or chunk of one): renames columns, drops nulls,
+    parses times and adds day of week and weekday features
+    """
     #rename columns
     cols = [col.replace(" ","_") for col in trips.columns]
     trips.columns = cols
@@ -94,29 +227,161 @@ def trip_initialize():
 
     #change times to datetime objects
     trips.starttime = pd.to_datetime(trips.starttime, format='%Y-%m-%d %H:%M:%S.%f')
-    trips.stoptime = pd.to_datetime(trips.starttime, format='%Y-%m-%d %H:%M:%S.%f')
+    trips.stoptime = pd.to_datetime(trips.stoptime, format='%Y-%m-%d %H:%M:%S.%f')
     
     #add day of week and weedday feature
     trips['day_of_week'] = trips.starttime.dt.weekday
     trips['weekday'] = np.where(trips.day_of_week<5,True,False)
 
+    return apply_schema(trips, TRIP_SCHEMA, categories=False)
+
+def map_months(func, filepaths, n_jobs=1):
+    """
+    Applies func to each monthly file and returns results in filepath order.
+    With n_jobs > 1 the months are spread over a process pool, with results
+    merged in the same order as the serial path so output is identical
+
+    ---Params---
+
+    func: module level function taking a filepath
+
+    filepaths: list of str, monthly files
+
+    n_jobs: int, number of worker processes, 1 runs serially in this process
+    """
+    if n_jobs is None or n_jobs <= 1:
+        return [func(path) for path in filepaths]
+
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        return list(pool.map(func, filepaths))
+
+def read_clean_trips(path):
+    """
+    Reads and cleans one monthly trip file
+    """
+    return clean_trips(pd.read_csv(path))
+
+def trip_initialize(n_jobs=1):
+    """
+    Reads Trip data and returns two time series by start station and end station
+    *** Currently only 2018 ***
+
+    ---Params---
+
+    n_jobs: int, number of worker processes used to read and clean months in parallel
+    """
+    #read and clean trips month by month
+    trip_dfs = map_months(read_clean_trips, TRIP_FILEPATHS, n_jobs)
+
+    trips = pd.concat(trip_dfs)
+
     pickle_out = open('data/pickle/trips.pickle','wb')
     pickle.dump(trips, pickle_out)
     pickle_out.close()
 
-    # multihierarchical index time series 
+    return index_trips(trips)
+
+def index_trips(trips):
+    """
+    Returns two multihierarchical index time series of clean trips by start station and end station
+    """
+    trips = apply_schema(trips, TRIP_SCHEMA)
+
     ts_starts_df = trips.set_index(['start_station_id','starttime']).sort_values(['start_station_id','starttime'])
-    ts_ends_df = trips.set_index(['end_station_id','stoptime']).sort_values(['end_station_id','stoptime'])
+    ts_ends_df = trips[ENDS_COLUMNS].set_index(['end_station_id','stoptime']).sort_values(['end_station_id','stoptime'])
 
     return ts_starts_df, ts_ends_df
 
-def historical_initalize():
+#chunk list of a trip store, in read order
+TRIP_STORE_CHUNKS = 'chunks.json'
+
+def trip_stream_initialize(filepaths=TRIP_FILEPATHS, store_dir='data/pickle/trips', chunksize=500000):
     """
-    Reads historical station data and returns a multiindex pandas time series 
-    *** Currently only 2018
+    Streams trip data into an on-disk store one chunk at a time so that peak memory
+    stays at roughly one chunk no matter how many months are read.
+    Each cleaned chunk is pickled to store_dir as <month>_<chunk number>.pickle and the
+    chunks written are recorded in store_dir/chunks.json, which read_trip_store follows.
+    A month's chunks from an earlier run are removed once its new chunks are written
+    Returns list of chunk paths written, in read order
+
+    ---Params---
+
+    filepaths: list of str, monthly trip csv files to ingest
+
+    store_dir: str, directory to write cleaned chunks to, created if missing
+
+    chunksize: int, number of csv rows read and cleaned at a time
     """
-    # read historical station data
-    filepaths = ['data/station_data/bikeshare_nyc_raw_jan2018.csv',
+    os.makedirs(store_dir, exist_ok=True)
+
+    chunk_names = []
+    for path in filepaths:
+        month = os.path.basename(path).split('-')[0]
+
+        #write the month under temporary names so a failed read leaves the old chunks intact
+        month_names = []
+        for i, chunk in enumerate(pd.read_csv(path, chunksize=chunksize)):
+            chunk = clean_trips(chunk)
+
+            name = f'{month}_{i:04d}.pickle'
+            pickle_out = open(os.path.join(store_dir, name + '.tmp'),'wb')
+            pickle.dump(chunk, pickle_out)
+            pickle_out.close()
+
+            month_names.append(name)
+
+        for name in os.listdir(store_dir):
+            if name.startswith(month + '_') and name.endswith('.pickle') and name not in month_names:
+                os.remove(os.path.join(store_dir, name))
+        for name in month_names:
+            os.replace(os.path.join(store_dir, name + '.tmp'), os.path.join(store_dir, name))
+
+        chunk_names += month_names
+
+    tmp = os.path.join(store_dir, TRIP_STORE_CHUNKS + '.tmp')
+    with open(tmp,'w') as f:
+        json.dump(chunk_names, f, indent=2)
+    os.replace(tmp, os.path.join(store_dir, TRIP_STORE_CHUNKS))
+
+    return [os.path.join(store_dir, name) for name in chunk_names]
+
+def read_trip_store(store_dir='data/pickle/trips', columns=None):
+    """
+    Yields cleaned trip chunks from a store written by trip_stream_initialize in order,
+    reading only the chunks recorded by its last run
+
+    ---Params---
+
+    store_dir: str, directory of cleaned chunks
+
+    columns: list of str, subset of columns to keep from each chunk, if None keeps all
+    """
+    with open(os.path.join(store_dir, TRIP_STORE_CHUNKS)) as f:
+        chunk_names = json.load(f)
+
+    for name in chunk_names:
+        chunk = pickle.load(open(os.path.join(store_dir, name),'rb'))
+        if columns is not None:
+            chunk = chunk[columns]
+        yield chunk
+
+def trip_stream_index(store_dir='data/pickle/trips'):
+    """
+    Builds and saves the trip index and flow cube from a store written by trip_stream_initialize,
+    holding one chunk plus the index columns of the trips read so far in memory.
+    Returns the TripIndex
+
+    ---Params---
+
+    store_dir: str, directory of cleaned chunks
+    """
+    trip_index = TripIndex.from_chunks(read_trip_store(store_dir, columns=TRIP_INDEX_COLUMNS))
+    trip_index.save()
+    FlowCube.from_trip_index(trip_index).save()
+    return trip_index
+
+#monthly station log files
+HISTORICAL_FILEPATHS = ['data/station_data/bikeshare_nyc_raw_jan2018.csv',
                 'data/station_data/bikeshare_nyc_raw_feb2018.csv',
                 'data/station_data/bikeshare_nyc_raw_mar2018.csv',
                 'data/station_data/bikeshare_nyc_raw_apr2018.csv',
@@ -129,82 +394,247 @@ def historical_initalize():
                 'data/station_data/bikeshare_nyc_raw_nov2018.csv',
                 'data/station_data/bikeshare_nyc_raw_dec2018.csv']
 
-    station_dfs = [pd.read_csv(path,delimiter='\t', dtype= {'minute':str,'hour':str,'date':str}) for path in filepaths ]
+#season by month number, index 0 unused
+SEASONS = np.array(['','winter','winter','spring','spring','spring','summer',
+                    'summer','summer','fall','fall','fall','winter'], dtype=object)
 
-    ts_stations = pd.concat(station_dfs)
+def read_station_log(path):
+    """
+    Reads one tab delimited bikeshare_nyc_raw file with integer hour, minute and pm columns
+    """
+    return pd.read_csv(path, delimiter='\t', dtype={'date':str})
 
+def clean_station_log(ts_stations):
+    """
+    Cleans raw station log rows using only vectorized operations: builds date_time from 
+    date/hour/minute/pm, and adds percent_full and season
+    """
     # rename columns
     ts_stations.rename(columns={'dock_id':'station_id','dock_name':'station_name'},inplace=True)
 
-    #assign am/pm
-    ts_stations.pm = np.where(ts_stations.pm == 1, 'PM','AM')
+    #convert 12 hour clock to minutes past midnight (12AM -> 0, 12PM -> 12)
+    hour = ts_stations.hour.values.astype(np.int64) % 12 + np.where(ts_stations.pm.values == 1, 12, 0)
+    minutes = hour * 60 + ts_stations.minute.values.astype(np.int64)
 
-    #convert to datetime objects
-    ts_stations.minute = ts_stations.minute.map(lambda x:x.zfill(2))
-    ts_stations.hour = ts_stations.hour.map(lambda x:x.zfill(2))
-    ts_stations['date_time'] = ts_stations.apply(lambda x: x['date'] + " " + str(x['hour']) + ":" + str(x['minute']) + x['pm'],
-                                                    axis=1)
-    ts_stations.date_time = pd.to_datetime(ts_stations.date_time, format='%y-%m-%d %I:%M%p') 
+    #parse each distinct date once and add time of day
+    dates = pd.to_datetime(ts_stations.date, format='%y-%m-%d', cache=True)
+    ts_stations['date_time'] = dates.values + minutes.astype('timedelta64[m]')
 
     #add percent_full
     ts_stations['percent_full'] = ts_stations.avail_bikes/ts_stations.tot_docks
 
     #add seasons
-    ts_stations['month'] = ts_stations.date_time.map(lambda x:x.month)
+    ts_stations['season'] = SEASONS[ts_stations.date_time.dt.month.values]
+
+    #drop uneeded cols
+    ts_stations.drop(columns=['pm','hour','minute','date'],inplace=True)
+
+    return apply_schema(ts_stations, STATION_LOG_SCHEMA, categories=False)
+
+def read_clean_station_log(path):
+    """
+    Reads and cleans one monthly station log file
+    """
+    return clean_station_log(read_station_log(path))
+
+def historical_initalize(n_jobs=1):
+    """
+    Reads historical station data and returns a multiindex pandas time series 
+    *** Currently only 2018
+
+    ---Params---
+
+    n_jobs: int, number of worker processes used to read and clean months in parallel
+    """
+    # read and clean historical station data month by month
+    station_dfs = map_months(read_clean_station_log, HISTORICAL_FILEPATHS, n_jobs)
 
-    def season(x):
-        if x >=3 and x <=5:
-            return 'spring'
-        elif x >=6 and x <=8:
-            return 'summer'
-        elif x >=9 and x <=11:
-            return 'fall'
-        else:
-            return 'winter'
+    ts_stations = pd.concat(station_dfs)
 
-    ts_stations['season'] = ts_stations.month.map(lambda x:season(x))
+    return index_station_log(ts_stations)
+
+def index_station_log(ts_stations):
+    """
+    Returns clean station log rows as a multihierarchical index time series by station
+    """
+    ts_stations = apply_schema(ts_stations, STATION_LOG_SCHEMA)
 
-    #multihierarchical index times series
     ts_stations.set_index(['station_id','date_time'],inplace=True)
     ts_stations.sort_values(['station_id','date_time'],inplace=True)
 
-    #drop uneeded cols
-    ts_stations.drop(columns=['month','pm','hour','minute','date'],inplace=True)
-
     return ts_stations
 
-def pickle_data():
+#manifest of processed source files and cache of cleaned months for incremental builds
+MANIFEST_PATH = 'data/pickle/manifest.json'
+MONTHS_DIR = 'data/pickle/months'
+
+def file_signature(path):
     """
-    Sends data to pickle for later use
+    Returns dict of size, modified time and sha1 content hash of a source file
     """
+    stat = os.stat(path)
+    sha1 = hashlib.sha1()
+    with open(path,'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha1.update(block)
 
-    live = station_initalize()
-    starts, ends = trip_initialize()
-    historical = historical_initalize()
+    return {'size':stat.st_size, 'mtime':stat.st_mtime, 'sha1':sha1.hexdigest()}
 
+def load_manifest(path=MANIFEST_PATH):
+    """
+    Returns manifest of processed source files, empty if no build has been recorded
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
 
-    pickle_out = open('data/pickle/live.pickle','wb')
-    pickle.dump(live, pickle_out)
-    pickle_out.close()
+def save_manifest(manifest, path=MANIFEST_PATH):
+    """
+    Writes manifest of processed source files
+    """
+    with open(path,'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
 
-    pickle_out = open('data/starts.pickle','wb')
-    pickle.dump(starts,pickle_out)
-    pickle_out.close()
+def changed_files(filepaths, manifest):
+    """
+    Returns dict of {path: signature} for source files that are new or changed since the manifest.
+    Files whose size and modified time match the manifest are not re-hashed
+    """
+    changed = {}
+    for path in filepaths:
+        if not os.path.exists(path):
+            continue
+        stat = os.stat(path)
+        old = manifest.get(path)
+        if old is not None and old['size'] == stat.st_size and old['mtime'] == stat.st_mtime:
+            continue
+
+        signature = file_signature(path)
+        if old is not None and old['sha1'] == signature['sha1']:
+            #touched but unchanged, record new mtime without reprocessing
+            manifest[path] = signature
+            continue
+        changed[path] = signature
+
+    return changed
+
+def month_cache_path(path):
+    """
+    Returns path of the cleaned month cache for a source file
+    """
+    return os.path.join(MONTHS_DIR, os.path.splitext(os.path.basename(path))[0] + '.pickle')
 
-    pickle_out = open('data/pickle/ends.pickle','wb')
-    pickle.dump(ends,pickle_out)
-    pickle_out.close()
+def load_months(filepaths):
+    """
+    Concatenates cached clean months for the given source files in order.
+    Raises FileNotFoundError if any of them has no cached month
+    """
+    missing = [path for path in filepaths if not os.path.exists(month_cache_path(path))]
+    if missing:
+        raise FileNotFoundError(f'no cached clean month for {missing}, rebuild with pickle_data(incremental=False)')
+    return pd.concat([pickle.load(open(month_cache_path(path),'rb')) for path in filepaths])
 
-    pickle_out = open('data/pickle/historical.pickle','wb')
-    pickle.dump(historical,pickle_out)
-    pickle_out.close()
+def removed_files(filepaths, manifest):
+    """
+    Drops source files that no longer exist from the manifest along with their cached months,
+    returns the removed paths among filepaths
+    """
+    removed = [path for path in filepaths if path in manifest and not os.path.exists(path)]
+    for path in removed:
+        del manifest[path]
+        if os.path.exists(month_cache_path(path)):
+            os.remove(month_cache_path(path))
+    return removed
+
+def pickle_data(incremental=False, refresh_live=True, n_jobs=1):
+    """
+    Sends data to pickle and the columnar store (src.store) for later use
+
+    ---Params---
+
+    incremental: bool, if True only new or changed monthly source files (by the manifest) are
+                parsed and merged with the cached clean months, otherwise every month is rebuilt
+
+    refresh_live: bool, if True live station data is re-downloaded and pickled
 
-def get_clean_data():
+    n_jobs: int, number of worker processes used to parse changed months
+
+    Returns memory_report of the rebuilt artifacts
+    """
+    os.makedirs(MONTHS_DIR, exist_ok=True)
+    manifest = load_manifest() if incremental else {}
+
+    if refresh_live:
+        live = station_initalize()
+
+        pickle_out = open('data/pickle/live.pickle','wb')
+        pickle.dump(live, pickle_out)
+        pickle_out.close()
+        save_frame(live, 'live')
+
+    #parse and cache only new or changed months
+    trip_changes = changed_files(TRIP_FILEPATHS, manifest)
+    for path, trips in zip(trip_changes, map_months(read_clean_trips, list(trip_changes), n_jobs)):
+        pickle_out = open(month_cache_path(path),'wb')
+        pickle.dump(trips, pickle_out)
+        pickle_out.close()
+
+    station_changes = changed_files(HISTORICAL_FILEPATHS, manifest)
+    for path, ts_stations in zip(station_changes, map_months(read_clean_station_log, list(station_changes), n_jobs)):
+        pickle_out = open(month_cache_path(path),'wb')
+        pickle.dump(ts_stations, pickle_out)
+        pickle_out.close()
+
+    #merge the clean months of every source file in the manifest into artifacts
+    trip_removed = removed_files(TRIP_FILEPATHS, manifest)
+    station_removed = removed_files(HISTORICAL_FILEPATHS, manifest)
+    manifest.update(trip_changes)
+    manifest.update(station_changes)
+    rebuilt = {}
+
+    if trip_changes or trip_removed:
+        #one copy of the trips, per station event times are served by the trip index
+        trips = load_months([path for path in TRIP_FILEPATHS if path in manifest]).reset_index(drop=True)
+        trips = apply_schema(trips, TRIP_SCHEMA)
+
+        pickle_out = open('data/pickle/trips.pickle','wb')
+        pickle.dump(trips, pickle_out)
+        pickle_out.close()
+
+        trip_index = TripIndex.from_trips(trips)
+        trip_index.save()
+        FlowCube.from_trip_index(trip_index).save()
+        save_frame(trips, 'trips')
+        rebuilt['trips'] = (trips, TRIP_SCHEMA)
+
+    if station_changes or station_removed:
+        historical = index_station_log(load_months([path for path in HISTORICAL_FILEPATHS if path in manifest]))
+
+        pickle_out = open('data/pickle/historical.pickle','wb')
+        pickle.dump(historical,pickle_out)
+        pickle_out.close()
+        save_frame(historical, 'historical')
+        rebuilt['historical'] = (historical, STATION_LOG_SCHEMA)
+
+    save_manifest(manifest)
+
+    report = memory_report(rebuilt)
+    for name, row in report.iterrows():
+        logger.info('%s: %.1f MB with default dtypes, %.1f MB compact (%.0f%%)',
+                    name, row.before_mb, row.after_mb, 100 * row.ratio)
+    return report
+
+def get_clean_data(n_jobs=1):
     """
     Returns clean data of start trips, end trips, historical stations and live stations
+
+    ---Params---
+
+    n_jobs: int, number of worker processes used to parse monthly files
     """
     live = station_initalize()
-    starts, ends = trip_initialize()
-    historical = historical_initalize()
+    starts, ends = trip_initialize(n_jobs)
+    historical = historical_initalize(n_jobs)
 
     return starts, ends, historical, live    
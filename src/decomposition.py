@@ -0,0 +1,109 @@
+import pandas as pd
+import numpy as np
+import warnings
+from collections import namedtuple
+
+#aligned time x station matrices of one decomposition
+Decomposition = namedtuple('Decomposition', ['observed','trend','seasonal','resid','period'])
+
+def moving_average(values, period):
+    """
+    Returns centered moving average of each column of a time x station array, matching the
+    two sided filter of statsmodels seasonal_decompose (even periods use half weights on the
+    two end points). Windows at the edges or containing a NaN are NaN
+
+    ---Params---
+
+    values: 2d numpy array, time x station
+
+    period: int, window length
+    """
+    n = len(values)
+    width = period + 1 if period % 2 == 0 else period
+    trend = np.full(values.shape, np.nan)
+    if n < width:
+        return trend
+
+    missing = np.isnan(values)
+    filled = np.where(missing, 0.0, values)
+    zeros = np.zeros((1, values.shape[1]))
+    sums = np.concatenate([zeros, np.cumsum(filled, axis=0)])
+    counts = np.concatenate([zeros, np.cumsum(missing, axis=0)])
+
+    window = sums[width:] - sums[:-width]
+    if period % 2 == 0:
+        window -= 0.5 * (filled[:n - width + 1] + filled[width - 1:])
+    window /= period
+    window[(counts[width:] - counts[:-width]) > 0] = np.nan
+
+    trend[width // 2:width // 2 + len(window)] = window
+    return trend
+
+def decompose_matrix(station_mat, period=24, model='additive'):
+    """
+    Returns Decomposition of every column of a time x station matrix into trend, seasonal and
+    residual components with a moving average decomposition, computed for all stations at
+    once. Matches statsmodels seasonal_decompose column by column
+
+    ---Params---
+
+    station_mat: DataFrame, time x station matrix on a regular grid (ex. StationSet.avail_bikes())
+
+    period: int, seasonal period in rows, 24 for daily and 168 for weekly seasonality of hourly data
+
+    model: str, 'additive' or 'multiplicative'
+    """
+    if model not in ('additive','multiplicative'):
+        raise ValueError("model must be 'additive' or 'multiplicative'")
+
+    values = station_mat.to_numpy(dtype=np.float64)
+    n = len(values)
+    trend = moving_average(values, period)
+    detrended = values - trend if model == 'additive' else values / trend
+
+    #mean of each phase of the period, padded with NaN to whole periods
+    n_periods = -(-n // period)
+    padded = np.full((n_periods * period, values.shape[1]), np.nan)
+    padded[:n] = detrended
+    with warnings.catch_warnings():
+        #stations with no data in a phase give NaN with an empty slice warning
+        warnings.simplefilter('ignore', RuntimeWarning)
+        phases = np.nanmean(padded.reshape(n_periods, period, -1), axis=0)
+    if model == 'additive':
+        phases -= phases.mean(axis=0)
+    else:
+        phases /= phases.mean(axis=0)
+
+    seasonal = np.tile(phases, (n_periods, 1))[:n]
+    resid = detrended - seasonal if model == 'additive' else detrended / seasonal
+
+    def frame(matrix):
+        return pd.DataFrame(matrix, index=station_mat.index, columns=station_mat.columns)
+
+    return Decomposition(station_mat, frame(trend), frame(seasonal), frame(resid), period)
+
+def seasonal_profiles(decomposition):
+    """
+    Returns station x phase DataFrame of one period of the seasonal component
+    (ex. each station's 24 hour profile for a period 24 decomposition), aligned to the
+    phase of the first row of the matrix
+    """
+    profiles = decomposition.seasonal.iloc[:decomposition.period].T
+    profiles.columns = range(decomposition.period)
+    return profiles
+
+def plot_decomposition(decomposition, station):
+    """
+    Plots observed, trend, seasonal and residual components of one station column
+    """
+    import matplotlib.pyplot as plt
+
+    components = [('Original', decomposition.observed, 'blue'), ('Trend', decomposition.trend, 'green'),
+                  ('Seasonal', decomposition.seasonal, 'orange'), ('Residuals', decomposition.resid, 'red')]
+
+    fig = plt.figure(figsize=(12,8))
+    for i, (label, matrix, color) in enumerate(components):
+        plt.subplot(411 + i)
+        plt.plot(matrix[station], label=label, color=color)
+        plt.legend(loc='upper left')
+    return fig
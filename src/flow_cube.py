@@ -0,0 +1,191 @@
+import pandas as pd
+import numpy as np
+import json
+import os
+from src.store import load_frame, new_version, publish_version
+from src.trip_index import TripIndex, TRIP_INDEX_DIR, TRIP_INDEX_COLUMNS
+
+#directory the flow cube is written to
+FLOW_CUBE_DIR = 'data/store/flow_cube'
+
+class FlowCube(object):
+    """
+    Dense station x time bucket counts of trip departures and arrivals
+
+    Built once at ingest from a TripIndex. Departures and arrivals are uint16 matrices of
+    shape (stations, buckets), with bucket b covering [start + b*freq, start + (b+1)*freq)
+    """
+
+    def __init__(self, stations, start, freq, departures, arrivals):
+        self.stations = stations
+        self.start = pd.Timestamp(start)
+        self.freq = freq
+        self.departures = departures
+        self.arrivals = arrivals
+
+    @classmethod
+    def from_trip_index(cls, trip_index, freq='15min'):
+        """
+        Builds cube from a TripIndex (see src.trip_index)
+
+        ---Params---
+
+        trip_index: TripIndex
+
+        freq: str, fixed pandas frequency string of the time buckets
+        """
+        step = pd.tseries.frequencies.to_offset(freq).nanos
+        first = min(trip_index.dep_times.min(), trip_index.arr_times.min())
+        last = max(trip_index.dep_times.max(), trip_index.arr_times.max())
+        start = pd.Timestamp(first).floor('D')
+        n_stations = len(trip_index.stations)
+        n_buckets = int((last - start.value) // step) + 1
+
+        def bucket_counts(offsets, times):
+            station_pos = np.repeat(np.arange(n_stations), np.diff(offsets))
+            flat = station_pos * n_buckets + (times - start.value) // step
+            counts = np.bincount(flat, minlength=n_stations * n_buckets)
+            return counts.astype(np.uint16).reshape(n_stations, n_buckets)
+
+        departures = bucket_counts(trip_index.dep_offsets, trip_index.dep_times)
+        arrivals = bucket_counts(trip_index.arr_offsets, trip_index.arr_times)
+
+        return cls(np.asarray(trip_index.stations), start, freq, departures, arrivals)
+
+    def save(self, path=FLOW_CUBE_DIR):
+        """
+        Writes cube matrices as .npy files for memory mapped loading, as a new version that is
+        swapped in atomically (see store.publish_version)
+        """
+        version = new_version(path)
+        for name in ['stations','departures','arrivals']:
+            np.save(os.path.join(version, name + '.npy'), getattr(self, name))
+        with open(os.path.join(version, 'meta.json'),'w') as f:
+            json.dump({'start':str(self.start), 'freq':self.freq}, f)
+        publish_version(version, path)
+
+    @classmethod
+    def load(cls, path=FLOW_CUBE_DIR, mmap_mode='r'):
+        """
+        Loads a cube written by save, memory mapped by default
+        """
+        path = os.path.realpath(path)
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        arrays = [np.load(os.path.join(path, name + '.npy'), mmap_mode=mmap_mode)
+                  for name in ['stations','departures','arrivals']]
+        return cls(arrays[0], meta['start'], meta['freq'], arrays[1], arrays[2])
+
+    @property
+    def index(self):
+        """
+        DatetimeIndex of bucket start times
+        """
+        return pd.date_range(self.start, periods=self.departures.shape[1], freq=self.freq)
+
+    def bucket_ratio(self, resample):
+        """
+        Returns the number of cube buckets per resample period, or None if resample is
+        not a whole multiple of the cube frequency or does not divide a day, since resample
+        anchors bins to the start of the day
+        """
+        try:
+            step = pd.tseries.frequencies.to_offset(resample).nanos
+        except ValueError:
+            return None
+        base = pd.tseries.frequencies.to_offset(self.freq).nanos
+        if step % base or pd.Timedelta('1D').value % step or self.start.value % step:
+            return None
+        return step // base
+
+    def _rollup(self, values, ratio):
+        """
+        Sums consecutive buckets of a station row or station matrix into groups of ratio
+        """
+        n = values.shape[-1] // ratio * ratio
+        pad = values.shape[-1] - n
+        if pad:
+            values = np.concatenate([values, np.zeros(values.shape[:-1] + (ratio - pad,), dtype=values.dtype)], axis=-1)
+        return values.reshape(values.shape[:-1] + (-1, ratio)).sum(axis=-1)
+
+    def net(self, station_id, resample='H'):
+        """
+        Returns a pandas Time Series of net bikes in/out of a station per resample time period,
+        from the station's first through last trip
+        Positive value indicates net gain of bikes over resample time period
+
+        ---Params---
+
+        resample: str, pandas frequency string, must be a whole multiple of the cube frequency
+        """
+        ratio = self.bucket_ratio(resample)
+        if ratio is None:
+            raise ValueError(f'{resample} is not a multiple of the cube frequency {self.freq}')
+
+        i = np.searchsorted(self.stations, int(station_id))
+        if i == len(self.stations) or self.stations[i] != int(station_id):
+            raise KeyError(station_id)
+
+        #only the station's own span, from the bucket of its first event to that of its last
+        active = np.flatnonzero(self.arrivals[i] | self.departures[i])
+        if not len(active):
+            return pd.Series([], dtype=np.int32, index=pd.DatetimeIndex([]), name='net_bikes')
+        lo = active[0] // ratio * ratio
+        hi = active[-1] + 1
+
+        net = self.arrivals[i, lo:hi].astype(np.int32) - self.departures[i, lo:hi].astype(np.int32)
+        net = self._rollup(net, ratio)
+        start = self.start + pd.Timedelta(pd.tseries.frequencies.to_offset(self.freq).nanos * int(lo), 'ns')
+        return pd.Series(net, index=pd.date_range(start, periods=len(net), freq=resample), name='net_bikes')
+
+    def net_matrix(self, resample='H', station_ids=None):
+        """
+        Returns a time x station DataFrame of net bikes in/out per resample time period
+
+        ---Params---
+
+        resample: str, pandas frequency string, must be a whole multiple of the cube frequency
+
+        station_ids: list of station ids to include, if None all stations in the cube
+        """
+        ratio = self.bucket_ratio(resample)
+        if ratio is None:
+            raise ValueError(f'{resample} is not a multiple of the cube frequency {self.freq}')
+
+        if station_ids is None:
+            rows = np.arange(len(self.stations))
+        else:
+            station_ids = np.asarray(station_ids, dtype=np.int64)
+            rows = np.searchsorted(self.stations, station_ids)
+            missing = (rows == len(self.stations)) | (self.stations[np.minimum(rows, len(self.stations) - 1)] != station_ids)
+            if missing.any():
+                raise KeyError(list(station_ids[missing]))
+
+        net = self.arrivals[rows].astype(np.int32) - self.departures[rows].astype(np.int32)
+        net = self._rollup(net, ratio)
+        return pd.DataFrame(net.T, index=pd.date_range(self.start, periods=net.shape[1], freq=resample),
+                            columns=pd.Index(self.stations[rows], name='station_id'))
+
+    def totals(self, kind='departures'):
+        """
+        Returns a pandas Time Series of system wide departures or arrivals per bucket
+        """
+        if kind == 'departures':
+            values = self.departures
+        elif kind == 'arrivals':
+            values = self.arrivals
+        else:
+            raise ValueError("kind must be 'departures' or 'arrivals'")
+        return pd.Series(values.sum(axis=0, dtype=np.int64), index=self.index, name=kind)
+
+def load_flow_cube(path=FLOW_CUBE_DIR):
+    """
+    Loads the flow cube, building it from the trip index if it has not been written at ingest
+    """
+    if os.path.exists(os.path.join(path, 'meta.json')):
+        return FlowCube.load(path)
+    if os.path.exists(TRIP_INDEX_DIR):
+        trip_index = TripIndex.load()
+    else:
+        trip_index = TripIndex.from_trips(load_frame('trips', columns=TRIP_INDEX_COLUMNS))
+    return FlowCube.from_trip_index(trip_index)
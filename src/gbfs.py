@@ -0,0 +1,147 @@
+import requests
+import json
+import os
+import time
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
+
+#default request timeout in seconds (connect, read)
+TIMEOUT = (3.05, 10)
+
+#citibike feed discovery and bike angels layer
+GBFS_URL = 'http://gbfs.citibikenyc.com/gbfs/gbfs.json'
+ANGELS_URL = 'https://layer.bicyclesharing.net/map/v1/nyc/stations'
+
+#on disk copies of slowly changing feeds
+CACHE_DIR = 'data/cache/gbfs'
+
+#feed discovery and regions rarely change, so their copies are kept at least this many seconds
+MIN_TTL = {'gbfs':3600, 'system_regions':24 * 3600}
+
+#seconds an expired copy keeps being served after a failed refresh before fetching again
+RETRY_AFTER = 60
+
+def make_session(retries=3, backoff=0.3, pool_size=8):
+    """
+    Returns a requests Session with pooled keep-alive connections and bounded retries
+    on connection errors and 5xx responses
+
+    ---Params---
+
+    retries: int, max retries per request
+
+    backoff: float, exponential backoff factor between retries in seconds
+
+    pool_size: int, max pooled connections per host
+    """
+    retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=[500, 502, 503, 504])
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=pool_size, pool_maxsize=pool_size)
+
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+#shared session so every fetch in a process reuses the same connection pool
+shared_session = make_session()
+
+#session without retries for fetches that can fall back to a cached copy
+fallback_session = make_session(retries=0)
+
+#in process copies of cached feeds, {path: (expires at, json)}
+_memo = {}
+
+def fetch_json(url, timeout=TIMEOUT, session=shared_session):
+    """
+    Returns the decoded json of a GET request, raising for HTTP errors
+    """
+    response = session.get(url, timeout=timeout)
+    response.raise_for_status()
+    return response.json()
+
+def fetch_feeds(feed_dict, names, timeout=TIMEOUT, session=shared_session):
+    """
+    Fetches several feeds concurrently over one pooled session and returns {name: json}
+
+    ---Params---
+
+    feed_dict: dict, {feed name: url}
+
+    names: list of str, feed names to fetch
+
+    timeout: float or (connect, read) tuple, per request timeout in seconds
+    """
+    with ThreadPoolExecutor(max_workers=len(names)) as pool:
+        futures = {name:pool.submit(fetch_json, feed_dict[name], timeout, session) for name in names}
+        return {name:future.result() for name, future in futures.items()}
+
+def cached_json(name, url, cache_dir=CACHE_DIR, timeout=TIMEOUT, session=None, min_ttl=None):
+    """
+    Returns the json of a feed from an in process or on disk copy while younger than the feed's
+    ttl, otherwise fetches and re-caches it. If the fetch fails the last cached copy is returned
+    and reused for RETRY_AFTER seconds before the next fetch
+
+    ---Params---
+
+    name: str, cache file name
+
+    url: str, feed url
+
+    session: requests Session, defaults to the shared session, or to one without retries
+             when a cached copy can answer a failed fetch
+
+    min_ttl: float, floor on the feed's ttl in seconds, defaults to MIN_TTL of the feed
+    """
+    path = os.path.join(cache_dir, name + '.json')
+    min_ttl = MIN_TTL.get(name, 0) if min_ttl is None else min_ttl
+    now = time.time()
+
+    memo = _memo.get(path)
+    if memo is not None and now < memo[0]:
+        return memo[1]
+
+    cached = None
+    if os.path.exists(path):
+        with open(path) as f:
+            cached = json.load(f)
+        expires = os.path.getmtime(path) + max(cached.get('ttl', 0), min_ttl)
+        if now < expires:
+            _memo[path] = (expires, cached)
+            return cached
+
+    if session is None:
+        session = shared_session if cached is None else fallback_session
+    try:
+        data = fetch_json(url, timeout, session)
+    except (requests.RequestException, ValueError):
+        if cached is None:
+            raise
+        _memo[path] = (now + RETRY_AFTER, cached)
+        return cached
+
+    #write then rename so readers in other processes never see a partial file
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path,'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+    _memo[path] = (now + max(data.get('ttl', 0), min_ttl), data)
+    return data
+
+def get_feed_dict(cache_dir=CACHE_DIR):
+    """
+    Returns {feed name: url} from GBFS feed discovery, plus the bike angels layer
+    """
+    feeds = cached_json('gbfs', GBFS_URL, cache_dir)['data']['en']['feeds']
+    feed_dict = {i['name']:i['url'] for i in feeds}
+    feed_dict['bike_angels'] = ANGELS_URL
+    return feed_dict
+
+def get_regions(cache_dir=CACHE_DIR):
+    """
+    Returns {region_id: region name}
+    """
+    regions_raw = cached_json('system_regions', get_feed_dict(cache_dir)['system_regions'], cache_dir)['data']['regions']
+    return {region['region_id']:region['name'] for region in regions_raw}
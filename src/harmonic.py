@@ -0,0 +1,222 @@
+import pandas as pd
+import numpy as np
+import time
+from scipy.stats import norm
+
+#training and test windows of the June 2018 system forecasts (see 02_modeling)
+TRAIN_INTERVAL = ('2018-06-17','2018-06-30')
+TEST_INTERVAL = ('2018-07-03 15:00','2018-07-14')
+
+#seasonal period in hours -> number of fourier terms, Prophet's defaults for daily and weekly seasonality
+SEASONALITIES = {'daily':(24, 4), 'weekly':(168, 3)}
+
+#max condition number of a station's normal equations, stations observed at too few hours of the
+#day or days of the week to pin down the seasonal terms are worse conditioned and left unfitted
+MAX_CONDITION = 1e5
+
+def fourier_terms(index, period, order):
+    """
+    Returns (time x 2*order) array of sine and cosine terms of a seasonal period in hours,
+    phased on hours since the epoch so any two indexes line up
+    """
+    hours = index.values.astype('datetime64[ns]').view(np.int64) / 3.6e12
+    angles = 2 * np.pi * hours[:, None] * np.arange(1, order + 1)[None, :] / period
+    return np.concatenate([np.sin(angles), np.cos(angles)], axis=1)
+
+class HarmonicForecaster(object):
+    """
+    Level plus fourier daily and weekly seasonality fit to every station of a time x station
+    matrix at once, a fast alternative to one Prophet model per station (growth='flat')
+
+    All stations share one design matrix, so fitting is one batched least squares solve of the
+    normal equations, weighted per station to skip its missing values
+    """
+
+    def __init__(self, seasonalities=SEASONALITIES, interval_width=0.8, max_condition=MAX_CONDITION):
+        """
+        ---Params---
+
+        seasonalities: dict, name -> (period in hours, fourier order)
+
+        interval_width: float, coverage of the prediction intervals, Prophet's default is 0.8
+
+        max_condition: float, stations whose normal equations are worse conditioned are left unfitted
+        """
+        self.seasonalities = seasonalities
+        self.interval_width = interval_width
+        self.max_condition = max_condition
+
+    def design(self, index):
+        """
+        Returns (design matrix, {seasonality name: column slice}) for a DatetimeIndex
+        """
+        blocks = [np.ones((len(index), 1))]
+        slices = {}
+        start = 1
+        for name, (period, order) in self.seasonalities.items():
+            blocks.append(fourier_terms(index, period, order))
+            slices[name] = slice(start, start + 2 * order)
+            start += 2 * order
+        return np.concatenate(blocks, axis=1), slices
+
+    def fit(self, station_mat):
+        """
+        Fits every station column of a time x station matrix, ignoring missing values
+
+        ---Params---
+
+        station_mat: DataFrame, time x station matrix on a regular grid (ex. build_station_matrix().frame())
+        """
+        X, self.slices = self.design(station_mat.index)
+        Y = station_mat.to_numpy(dtype=np.float64)
+        observed = ~np.isnan(Y)
+        W = observed.astype(np.float64)
+        n_terms = X.shape[1]
+
+        #per station normal equations X'WX b = X'Wy, built with two matrix products for all stations
+        XtWX = (W.T @ (X[:, :, None] * X[:, None, :]).reshape(len(X), -1)).reshape(-1, n_terms, n_terms)
+        XtWy = (X.T @ np.where(observed, Y, 0.0)).T
+
+        #stations with too few observations, or whose observations leave the seasonal terms
+        #(near) collinear, are not fitted
+        n_obs = observed.sum(axis=0)
+        fitted = n_obs > n_terms
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fitted[fitted] = np.linalg.cond(XtWX[fitted]) < self.max_condition
+        #unfitted stations get an identity system and are masked out below
+        XtWX[~fitted] = np.eye(n_terms)
+        self.coef = np.linalg.solve(XtWX, XtWy[:, :, None])[:, :, 0]
+        self.coef[~fitted] = np.nan
+
+        resid = np.where(observed, Y - X @ self.coef.T, 0.0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.sigma = np.sqrt((resid**2).sum(axis=0) / (n_obs - n_terms))
+        self.sigma[~fitted] = np.nan
+
+        self.columns = station_mat.columns
+        self.history = station_mat.index
+        return self
+
+    def predict(self, index):
+        """
+        Returns dict of time x station DataFrames for a DatetimeIndex: yhat, yhat_lower, yhat_upper
+        and one component per seasonality (ex. daily, weekly)
+        """
+        X, slices = self.design(index)
+        z = norm.ppf(0.5 + self.interval_width / 2)
+
+        def frame(values):
+            return pd.DataFrame(values, index=pd.DatetimeIndex(index, name='date_time'), columns=self.columns)
+
+        yhat = X @ self.coef.T
+        result = {'yhat':frame(yhat), 'yhat_lower':frame(yhat - z * self.sigma), 'yhat_upper':frame(yhat + z * self.sigma)}
+        for name, cols in slices.items():
+            result[name] = frame(X[:, cols] @ self.coef[:, cols].T)
+        return result
+
+    def future_index(self, periods, freq='H', include_history=True):
+        """
+        Returns DatetimeIndex of the fitted history followed by periods steps past it,
+        like Prophet's make_future_dataframe
+        """
+        future = pd.date_range(self.history[-1], periods=periods + 1, freq=freq)[1:]
+        return self.history.append(future) if include_history else future
+
+def forecast_system(station_mat, train_interval=TRAIN_INTERVAL, periods=180*24, freq='H', interval_width=0.8,
+                    intervals=False):
+    """
+    Fits a HarmonicForecaster over train_interval and returns (system_forcast, system_daily) DataFrames
+    indexed by date_time with yhat_<id> and daily_<id> columns, in the format of the per station Prophet
+    pipeline (see src.prophet_pipeline), covering the training window plus periods steps past it
+
+    ---Params---
+
+    station_mat: DataFrame, time x station matrix (ex. build_station_matrix().frame(columns))
+
+    train_interval: ('YYYY-MM-DD HH:MM','YYYY-MM-DD HH:MM'), tuple of 2 strings, training window
+
+    periods: int, number of freq periods forecast past the training window
+
+    interval_width: float, coverage of the prediction intervals
+
+    intervals: bool, if True also returns a third DataFrame of yhat_lower_<id> and yhat_upper_<id> columns
+    """
+    train = station_mat[train_interval[0]:train_interval[1]]
+    model = HarmonicForecaster(interval_width=interval_width).fit(train)
+    forecast = model.predict(model.future_index(periods, freq))
+    stations = [str(col) for col in train.columns]
+
+    #stations without enough data to fit are left out, as failed Prophet fits are
+    fitted = ~np.isnan(model.coef[:, 0])
+
+    def named(df, prefix):
+        df = df.loc[:, fitted]
+        df.columns = [prefix + station for station, keep in zip(stations, fitted) if keep]
+        return df
+
+    system_forcast = named(forecast['yhat'], 'yhat_')
+    system_daily = named(forecast['daily'], 'daily_')
+    if not intervals:
+        return system_forcast, system_daily
+    bounds = pd.concat([named(forecast['yhat_lower'], 'yhat_lower_'), named(forecast['yhat_upper'], 'yhat_upper_')], axis=1)
+    return system_forcast, system_daily, bounds
+
+def forecast_errors(system_forcast, actual, interval):
+    """
+    Returns (rmse, mae) of a yhat_<id> forecast frame against a time x station matrix of actual
+    values over an interval, over every non missing station hour
+    """
+    actual = actual[interval[0]:interval[1]]
+    actual = actual[[col for col in actual.columns if 'yhat_' + str(col) in system_forcast.columns]]
+    pred = system_forcast.reindex(actual.index)[['yhat_' + str(col) for col in actual.columns]].to_numpy()
+    error = (pred - actual.to_numpy(dtype=np.float64))
+    error = error[~np.isnan(error)]
+    return np.sqrt(np.mean(error**2)), np.mean(np.abs(error))
+
+def benchmark(station_mat, stations=None, train_interval=TRAIN_INTERVAL, test_interval=TEST_INTERVAL,
+              freq='H', prophet=True, n_jobs=-1):
+    """
+    Returns DataFrame comparing the harmonic forecaster with the per station Prophet pipeline:
+    fit and forecast seconds plus train and test RMSE/MAE, on the stations both could fit
+
+    ---Params---
+
+    station_mat: DataFrame, time x station matrix covering the train and test windows
+
+    stations: list of station columns to compare, if None all
+
+    train_interval, test_interval: ('YYYY-MM-DD HH:MM','YYYY-MM-DD HH:MM'), tuples of 2 strings
+
+    freq: str, pandas date offset string of station_mat
+
+    prophet: bool, if False only the harmonic forecaster is timed and scored
+
+    n_jobs: int, worker processes of the Prophet pipeline
+    """
+    if stations is not None:
+        station_mat = station_mat[stations]
+    #forecast far enough past the training window to cover the test window
+    step = pd.tseries.frequencies.to_offset(freq).nanos
+    periods = int((pd.Period(test_interval[1]).end_time - pd.Period(train_interval[1]).end_time).value // step) + 1
+
+    runs = {}
+    started = time.perf_counter()
+    runs['harmonic'] = (forecast_system(station_mat, train_interval, periods, freq)[0], time.perf_counter() - started)
+    if prophet:
+        from src.prophet_pipeline import forecast_system as prophet_forecast
+        from tempfile import TemporaryDirectory
+        with TemporaryDirectory() as results_dir:
+            started = time.perf_counter()
+            runs['prophet'] = (prophet_forecast(station_mat, train_interval, periods, freq, n_jobs=n_jobs,
+                                                results_dir=results_dir)[0],
+                               time.perf_counter() - started)
+
+    common = set.intersection(*[set(system_forcast.columns) for system_forcast, _ in runs.values()])
+    rows = []
+    for method, (system_forcast, seconds) in runs.items():
+        system_forcast = system_forcast[sorted(common)]
+        train_rmse, train_mae = forecast_errors(system_forcast, station_mat, train_interval)
+        test_rmse, test_mae = forecast_errors(system_forcast, station_mat, test_interval)
+        rows.append({'method':method, 'stations':len(common), 'seconds':seconds,
+                     'train_rmse':train_rmse, 'train_mae':train_mae, 'test_rmse':test_rmse, 'test_mae':test_mae})
+    return pd.DataFrame(rows).set_index('method')
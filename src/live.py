@@ -0,0 +1,208 @@
+import pandas as pd
+import threading
+import time
+import logging
+from collections import namedtuple
+from src.cleaning import merge_live, angel_points
+from src.gbfs import fetch_feeds, cached_json, get_feed_dict, TIMEOUT
+from src.store import load_frame, has_frame
+from src.registry import StationRegistry
+
+logger = logging.getLogger(__name__)
+
+class LiveStationTable(object):
+    """
+    Station id indexed table of live station data kept up to date with differential updates
+
+    station_information rarely changes, so it is read through the ttl cache and only re-merged
+    when its last_updated changes. On every other update only stations whose status
+    last_reported advanced (or whose bike angels action changed) are written in place
+
+    The table keeps every station_status station, including ones missing from station_information
+    or the bike angels layer, so a station missing from one feed does not force a rebuild
+    """
+
+    def __init__(self, timeout=TIMEOUT):
+        self.timeout = timeout
+        self.table = None
+        self.info_updated = None
+
+    def _rebuild(self, information, status, angels):
+        self.table = merge_live(information['data']['stations'], status['data']['stations'],
+                                angels['features'], drop_out_of_service=False, keep_unmatched=True).set_index('station_id')
+        self.info_updated = information.get('last_updated')
+
+        #status column -> table column, status fields also in station_information get a _y suffix
+        status_cols = pd.DataFrame(status['data']['stations'][:1]).columns.drop('station_id')
+        self.status_cols = {col:(col + '_y' if col + '_y' in self.table.columns else col) for col in status_cols}
+
+    def _apply_status(self, status):
+        status_df = pd.DataFrame(status['data']['stations'])
+        status_df.station_id = status_df.station_id.astype(int)
+        status_df = status_df.set_index('station_id')
+
+        common = status_df.index.intersection(self.table.index)
+        advanced = common[status_df.loc[common, 'last_reported'].values > self.table.loc[common, 'last_reported'].values]
+        for col, target in self.status_cols.items():
+            if col in status_df.columns:
+                self.table.loc[advanced, target] = status_df.loc[advanced, col].values
+
+        return len(advanced)
+
+    def _apply_angels(self, angels):
+        angels_df = pd.DataFrame([i['properties'] for i in angels['features']])
+        angels_df.station_id = angels_df.station_id.astype(int)
+        #stations missing from the layer get no action and zero points, as in _rebuild
+        angels_df = angels_df.drop_duplicates('station_id').set_index('station_id').reindex(self.table.index)
+
+        points = pd.Series(angel_points(angels_df.bike_angels_action, angels_df.bike_angels_points), index=self.table.index)
+        changed = self.table.index[(points.values != self.table.bike_angels_points.values)
+                                   | (angels_df.bike_angels_action.fillna('').values
+                                      != self.table.bike_angels_action.fillna('').values)]
+
+        self.table.loc[changed, 'bike_angels_action'] = angels_df.loc[changed, 'bike_angels_action'].values
+        self.table.loc[changed, 'bike_angels_points'] = points[changed].values
+        self.table.loc[changed, 'bike_angels_digits'] = angels_df.loc[changed, 'bike_angels_digits'].values
+
+    def update(self):
+        """
+        Fetches the feeds, applies changes and returns a live DataFrame shaped like
+        cleaning.station_initalize
+        """
+        feed_dict = get_feed_dict()
+        information = cached_json('station_information', feed_dict['station_information'], timeout=self.timeout)
+        feeds = fetch_feeds(feed_dict, ['station_status','bike_angels'], self.timeout)
+        status, angels = feeds['station_status'], feeds['bike_angels']
+
+        status_ids = set(int(i['station_id']) for i in status['data']['stations'])
+        if self.table is None or information.get('last_updated') != self.info_updated \
+                or not status_ids.issubset(self.table.index):
+            self._rebuild(information, status, angels)
+        else:
+            self._apply_status(status)
+            self._apply_angels(angels)
+
+        #stations without station_information have no name or location to show
+        live_df = self.table.loc[(self.table.station_status != 'out_of_service')
+                                 & self.table.station_name.notna()].reset_index()
+        live_df.attrs['ttl'] = status.get('ttl', 0)
+        live_df.attrs['last_updated'] = status.get('last_updated')
+        return live_df
+
+#immutable snapshot of the live feed, replaced as a whole on every refresh
+Snapshot = namedtuple('Snapshot', ['frame', 'registry', 'fetched_at', 'last_updated', 'ttl'])
+
+#served while no live data has been stored or fetched yet, every station lookup misses
+_empty_frame = pd.DataFrame(columns=['station_id','station_name','lat','lon','capacity',
+                                     'num_bikes_available','num_docks_available'])
+EMPTY_SNAPSHOT = Snapshot(_empty_frame, StationRegistry(_empty_frame), 0, None, 0)
+
+class LiveSnapshot(object):
+    """
+    Holds the latest live station DataFrame and refreshes it on a background thread
+    at the feed's ttl
+
+    Readers just read the current snapshot attribute. A refresh builds a whole new
+    Snapshot and swaps the reference in one assignment, so readers never lock and never
+    see a half updated frame
+    """
+
+    def __init__(self, loader=None, min_interval=30, retry_interval=15, wait_timeout=5):
+        """
+        ---Params---
+
+        loader: function returning a live DataFrame with 'ttl' and 'last_updated' attrs,
+                if None a LiveStationTable is updated differentially
+
+        min_interval: float, minimum seconds between refreshes regardless of feed ttl
+
+        retry_interval: float, seconds to wait after a failed refresh
+
+        wait_timeout: float, max seconds a reader waits for the first fetch before getting
+                      the empty snapshot
+        """
+        self.loader = LiveStationTable().update if loader is None else loader
+        self.min_interval = min_interval
+        self.retry_interval = retry_interval
+        self.wait_timeout = wait_timeout
+        self.snapshot = None
+        self._waited = False
+        self._ready = threading.Event()
+        self._thread = None
+
+        #start from the last stored snapshot so the dashboard has data before the first fetch
+        if has_frame('live'):
+            self._swap(load_frame('live'), fetched_at=0)
+
+    def _swap(self, frame, fetched_at=None):
+        self.snapshot = Snapshot(frame,
+                                 StationRegistry(frame),
+                                 time.time() if fetched_at is None else fetched_at,
+                                 frame.attrs.get('last_updated'),
+                                 frame.attrs.get('ttl', 0))
+        self._ready.set()
+
+    def refresh(self):
+        """
+        Fetches the live feed and swaps in a new snapshot
+        """
+        self._swap(self.loader())
+        return self.snapshot
+
+    def next_refresh(self):
+        """
+        Returns seconds until the current snapshot expires
+        """
+        snapshot = self.snapshot
+        if snapshot is None:
+            return 0
+        ttl = max(snapshot.ttl or 0, self.min_interval)
+        return max(snapshot.fetched_at + ttl - time.time(), 0)
+
+    def _run(self):
+        while True:
+            time.sleep(self.next_refresh())
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception('live snapshot refresh failed')
+                time.sleep(self.retry_interval)
+
+    def start(self):
+        """
+        Starts the background refresher thread, if not already running
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='live-snapshot', daemon=True)
+            self._thread.start()
+        return self
+
+    def current(self):
+        """
+        Returns the current Snapshot, waiting up to wait_timeout seconds for the first fetch if
+        nothing is stored yet, so readers never hang on an unreachable feed. Returns
+        EMPTY_SNAPSHOT if no data arrived in time, without waiting again on later reads
+        """
+        snapshot = self.snapshot
+        if snapshot is None:
+            if self._waited or not self._ready.wait(self.wait_timeout):
+                if not self._waited:
+                    logger.warning('no live snapshot after %ss, serving empty snapshot', self.wait_timeout)
+                self._waited = True
+                return EMPTY_SNAPSHOT
+            snapshot = self.snapshot
+        return snapshot
+
+    @property
+    def frame(self):
+        """
+        Current live station DataFrame, empty if no data arrived within wait_timeout
+        """
+        return self.current().frame
+
+    @property
+    def registry(self):
+        """
+        StationRegistry of the current live snapshot, empty if no data arrived within wait_timeout
+        """
+        return self.current().registry
@@ -0,0 +1,183 @@
+import pandas as pd
+import numpy as np
+import json
+import os
+import hashlib
+import logging
+import pickle
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from src.store import save_frame, PICKLES
+
+try:
+    from fbprophet import Prophet
+except ImportError:
+    from prophet import Prophet
+
+logger = logging.getLogger(__name__)
+
+#root of per station forecast checkpoints, one directory per run key
+PROPHET_DIR = 'data/store/prophet'
+
+#training window and model of the system forecasts served by the dashboard
+TRAIN_INTERVAL = ('2018-06-17','2018-06-30')
+PROPHET_PARAMS = {'growth':'flat', 'weekly_seasonality':True, 'daily_seasonality':True}
+
+def fit_station(args):
+    """
+    Fits Prophet to one station series and returns (station, ds, yhat, daily) arrays of its forecast
+    """
+    station, ds, y, params, periods, freq = args
+    for name in ['fbprophet','prophet','cmdstanpy']:
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    model = Prophet(**params)
+    model.fit(pd.DataFrame({'ds':ds, 'y':y}))
+    forecast = model.predict(model.make_future_dataframe(periods=periods, freq=freq))
+    return station, forecast.ds.values, forecast.yhat.values, forecast.daily.values
+
+def run_dir(train_interval, periods, freq, params, results_dir=PROPHET_DIR):
+    """
+    Returns checkpoint directory of a run, keyed by its training window and model parameters
+    so runs with different settings never resume from each other
+    """
+    key = json.dumps({'train_interval':list(train_interval), 'periods':periods, 'freq':freq, 'params':params},
+                     sort_keys=True)
+    return os.path.join(results_dir, hashlib.sha1(key.encode()).hexdigest()[:12])
+
+def training_hash(ds, y):
+    """
+    Returns hash of a station's training series, stored with its checkpoint so forecasts of
+    rebuilt training data are never resumed
+    """
+    sha1 = hashlib.sha1(np.ascontiguousarray(np.asarray(ds, dtype='datetime64[ns]')).view(np.int64).tobytes())
+    sha1.update(np.ascontiguousarray(np.asarray(y, dtype=np.float64)).tobytes())
+    return sha1.hexdigest()
+
+def _checkpoint(path, station, payload):
+    """
+    Writes one station's result atomically so an interrupted run never leaves a partial checkpoint
+    """
+    tmp = os.path.join(path, f'.{station}.{os.getpid()}.tmp')
+    pickle_out = open(tmp,'wb')
+    pickle.dump(payload, pickle_out)
+    pickle_out.close()
+    os.replace(tmp, os.path.join(path, f'{station}.pickle'))
+
+def _load_checkpoint(path, station):
+    checkpoint = os.path.join(path, f'{station}.pickle')
+    if not os.path.exists(checkpoint):
+        return None
+    return pickle.load(open(checkpoint,'rb'))
+
+def forecast_system(station_mat, train_interval=TRAIN_INTERVAL, periods=180*24, freq='H', params=None,
+                    n_jobs=-1, results_dir=PROPHET_DIR, retry_errors=False, save=False):
+    """
+    Fits one Prophet model per station column over a process pool and returns (system_forcast,
+    system_daily) DataFrames indexed by date_time with yhat_<id> and daily_<id> columns
+
+    Each station's forecast is checkpointed as soon as it finishes, with a hash of its training
+    series, so rerunning with the same settings resumes where an interrupted run stopped while
+    stations whose training data changed are refit. Stations whose fit fails are logged,
+    checkpointed as errors and left out of the result
+
+    ---Params---
+
+    station_mat: DataFrame, time x station matrix (ex. build_station_matrix().frame(columns))
+
+    train_interval: ('YYYY-MM-DD HH:MM','YYYY-MM-DD HH:MM'), tuple of 2 strings, training window
+
+    periods: int, number of freq periods forecast past the training window
+
+    freq: str, pandas date offset string of the forecast
+
+    params: dict, Prophet keyword arguments, defaults to PROPHET_PARAMS
+
+    n_jobs: int, number of worker processes, -1 uses every core and 1 runs serially in this process
+
+    retry_errors: bool, if True refits stations whose previous fit failed
+
+    save: bool, if True writes both frames to the stored system_forcast and system_daily data
+    """
+    params = PROPHET_PARAMS if params is None else params
+    if n_jobs is None or n_jobs < 1:
+        n_jobs = os.cpu_count()
+
+    path = run_dir(train_interval, periods, freq, params, results_dir)
+    os.makedirs(path, exist_ok=True)
+
+    train = station_mat[train_interval[0]:train_interval[1]]
+    stations = [str(col) for col in train.columns]
+    tasks = []
+    hashes = {}
+    for station, col in zip(stations, train.columns):
+        y = train[col].values.astype(np.float64)
+        hashes[station] = training_hash(train.index.values, y)
+        checkpoint = _load_checkpoint(path, station)
+        if checkpoint is not None and checkpoint.get('train_hash') == hashes[station] \
+                and (checkpoint.get('error') is None or not retry_errors):
+            continue
+        tasks.append((station, train.index.values, y, params, periods, freq))
+    logger.info('%s stations to fit, %s resumed from checkpoints', len(tasks), len(stations) - len(tasks))
+
+    def record(station, result=None, error=None):
+        if error is not None:
+            logger.warning('fit failed at station %s: %s', station, error)
+            _checkpoint(path, station, {'error':error, 'train_hash':hashes[station]})
+        else:
+            _, ds, yhat, daily = result
+            _checkpoint(path, station, {'error':None, 'train_hash':hashes[station], 'ds':ds, 'yhat':yhat, 'daily':daily})
+
+    if n_jobs == 1:
+        for task in tasks:
+            try:
+                record(task[0], fit_station(task))
+            except Exception as e:
+                record(task[0], error=f'{type(e).__name__}: {e}')
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            futures = {pool.submit(fit_station, task):task[0] for task in tasks}
+            for future in as_completed(futures):
+                try:
+                    record(futures[future], future.result())
+                except Exception as e:
+                    record(futures[future], error=f'{type(e).__name__}: {e}')
+
+    system_forcast, system_daily = collect_forecasts(path, stations, hashes)
+    if save:
+        save_forecasts(system_forcast, system_daily)
+    return system_forcast, system_daily
+
+def collect_forecasts(path, stations, hashes=None):
+    """
+    Assembles (system_forcast, system_daily) frames from the checkpoints of a run,
+    in station order, skipping stations without a successful fit
+
+    ---Params---
+
+    hashes: dict, {station: training_hash}, if given checkpoints of other training data are skipped
+    """
+    yhat = {}
+    daily = {}
+    ds = None
+    for station in stations:
+        checkpoint = _load_checkpoint(path, station)
+        if checkpoint is None or checkpoint.get('error') is not None:
+            continue
+        if hashes is not None and checkpoint.get('train_hash') != hashes[station]:
+            continue
+        ds = checkpoint['ds']
+        yhat['yhat_' + station] = checkpoint['yhat']
+        daily['daily_' + station] = checkpoint['daily']
+
+    index = pd.DatetimeIndex([] if ds is None else ds, name='date_time')
+    return pd.DataFrame(yhat, index=index), pd.DataFrame(daily, index=index)
+
+def save_forecasts(system_forcast, system_daily):
+    """
+    Writes forecasts to the stored system_forcast and system_daily data read by the dashboard
+    """
+    for name, df in [('system_forcast', system_forcast), ('system_daily', system_daily)]:
+        pickle_out = open(PICKLES[name],'wb')
+        pickle.dump(df, pickle_out)
+        pickle_out.close()
+        save_frame(df, name)
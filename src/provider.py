@@ -0,0 +1,191 @@
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from src.store import load_frame, save_frame, PICKLES
+from src.trip_index import TripIndex, TRIP_INDEX_DIR, TRIP_INDEX_COLUMNS
+from src.flow_cube import FlowCube, load_flow_cube
+from src.cleaning import station_initalize
+from src.registry import set_registry
+
+class DataProvider(object):
+    """
+    Process wide source of the station datasets. Each dataset is loaded on first access and
+    then shared, so importing src.station costs nothing until a dataset is actually used
+
+    Datasets: live, trips, historical, trip_index, flow_cube
+    """
+
+    DATASETS = ('live','trips','historical','trip_index','flow_cube')
+
+    #datasets built from others, rebuilt when their sources are replaced
+    DERIVED = {'trip_index':('trips',), 'flow_cube':('trips',)}
+
+    def __init__(self, memo_size=256, **datasets):
+        """
+        ---Params---
+
+        memo_size: int, max number of derived results kept by memoize
+
+        datasets: optional alternate datasets by name (ex. historical=small_df) used instead of
+                  the stored ones, for tests and benchmarks on smaller data
+        """
+        self._data = {}
+        self._injected = set()
+        self._lock = threading.RLock()
+        self._memo = OrderedDict()
+        self.memo_size = memo_size
+        #per dataset counter bumped whenever it is replaced, so memoized results know they are stale
+        self.versions = dict.fromkeys(self.DATASETS, 0)
+        self.inject(**datasets)
+
+    def _load(self, name):
+        #trip aggregates are rebuilt from injected trips rather than read from disk
+        injected_trips = 'trips' in self._injected
+        if name == 'trip_index':
+            if os.path.exists(TRIP_INDEX_DIR) and not injected_trips:
+                return TripIndex.load()
+            return TripIndex.from_trips(self.trips if injected_trips else load_frame('trips', columns=TRIP_INDEX_COLUMNS))
+        if name == 'flow_cube':
+            if injected_trips:
+                return FlowCube.from_trip_index(self.trip_index)
+            return load_flow_cube()
+        return load_frame(name)
+
+    def get(self, name):
+        """
+        Returns a dataset by name, loading it on first access
+        """
+        if name not in self.DATASETS:
+            raise KeyError(name)
+        if name not in self._data:
+            with self._lock:
+                if name not in self._data:
+                    self._data[name] = self._load(name)
+        return self._data[name]
+
+    def __getattr__(self, name):
+        if name in DataProvider.DATASETS:
+            return self.get(name)
+        raise AttributeError(name)
+
+    def loaded(self):
+        """
+        Returns names of the datasets currently in memory
+        """
+        return [name for name in self.DATASETS if name in self._data]
+
+    def is_injected(self, name):
+        """
+        Returns True if the dataset was injected rather than loaded from the stored data
+        """
+        return name in self._injected
+
+    def inject(self, **datasets):
+        """
+        Replaces datasets by name with alternate ones
+        """
+        for name in datasets:
+            if name not in self.DATASETS:
+                raise KeyError(name)
+        with self._lock:
+            self._data.update(datasets)
+            self._injected.update(datasets)
+            self._replaced(datasets)
+            if 'live' in datasets:
+                set_registry(datasets['live'])
+
+    def reset(self, *names):
+        """
+        Drops datasets by name (all if none given) so they are reloaded on next access
+        """
+        with self._lock:
+            names = names or self.DATASETS
+            for name in names:
+                self._data.pop(name, None)
+                self._injected.discard(name)
+            self._replaced(names)
+
+    def _replaced(self, names):
+        """
+        Bumps the versions of replaced datasets and drops loaded datasets derived from them
+        """
+        for name in names:
+            self.versions[name] += 1
+        for name, sources in self.DERIVED.items():
+            if name not in names and name not in self._injected and set(sources).intersection(names):
+                self._data.pop(name, None)
+                self.versions[name] += 1
+
+    def memoize(self, key, compute, datasets=DATASETS):
+        """
+        Returns compute() for a hashable key, reusing results computed since the datasets it reads
+        were last replaced. Least recently used results are dropped past memo_size
+
+        ---Params---
+
+        key: hashable, identifies the result
+
+        compute: function with no arguments returning the result
+
+        datasets: names of the datasets compute reads, replacing any other dataset keeps the result
+        """
+        with self._lock:
+            versions = tuple(self.versions[name] for name in datasets)
+            entry = self._memo.get(key)
+            if entry is not None and entry[0] == versions:
+                self._memo.move_to_end(key)
+                return entry[1]
+
+        result = compute()
+
+        with self._lock:
+            #skip results computed from datasets replaced while computing
+            if versions == tuple(self.versions[name] for name in datasets):
+                self._memo[key] = (versions, result)
+                self._memo.move_to_end(key)
+                while len(self._memo) > self.memo_size:
+                    self._memo.popitem(last=False)
+        return result
+
+    def refresh_live(self, live_df=None, save=True):
+        """
+        Replaces the live dataset without touching the others and returns it
+
+        ---Params---
+
+        live_df: DataFrame, new live data, fetched with cleaning.station_initalize if None
+
+        save: bool, if True also writes it to the stored live data
+        """
+        if live_df is None:
+            live_df = station_initalize()
+
+        if save:
+            pickle_out = open(PICKLES['live'],'wb')
+            pickle.dump(live_df, pickle_out)
+            pickle_out.close()
+            save_frame(live_df, 'live')
+
+        self.inject(live=live_df)
+        return live_df
+
+#process wide data provider
+_provider = None
+
+def get_provider():
+    """
+    Returns the process wide DataProvider, created empty on first use
+    """
+    global _provider
+    if _provider is None:
+        _provider = DataProvider()
+    return _provider
+
+def set_provider(provider):
+    """
+    Replaces the process wide DataProvider (ex. set_provider(DataProvider(historical=sample)))
+    """
+    global _provider
+    _provider = provider
+    return _provider
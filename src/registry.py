@@ -0,0 +1,69 @@
+from src.store import load_frame
+from src.search import StationNameIndex
+from src.spatial import StationSpatialIndex
+
+class StationRegistry(object):
+    """
+    Station id keyed lookup of live station records, built once per live snapshot.
+    Returns a whole station record as a dict in one lookup instead of scanning the
+    live DataFrame once per field
+    """
+
+    def __init__(self, live_df):
+        self.frame = live_df
+        self.records = {int(record['station_id']):record for record in live_df.to_dict('records')}
+        self._name_index = None
+        self._spatial_index = None
+
+    @property
+    def name_index(self):
+        """
+        StationNameIndex over the snapshot's station names, built on first search
+        """
+        if self._name_index is None:
+            self._name_index = StationNameIndex(self.frame.station_name.values, self.frame.station_id.values)
+        return self._name_index
+
+    @property
+    def spatial_index(self):
+        """
+        StationSpatialIndex over the snapshot's station coordinates and availability, built on first query
+        """
+        if self._spatial_index is None:
+            self._spatial_index = StationSpatialIndex.from_live(self.frame)
+        return self._spatial_index
+
+    def get(self, station_id, default=None):
+        """
+        Returns dict record of a station, or default if the station is not in the snapshot
+        """
+        return self.records.get(int(station_id), default)
+
+    def __getitem__(self, station_id):
+        return self.records[int(station_id)]
+
+    def __contains__(self, station_id):
+        return int(station_id) in self.records
+
+    def __len__(self):
+        return len(self.records)
+
+#process wide registry of the stored live snapshot
+_registry = None
+
+def get_registry():
+    """
+    Returns the process wide StationRegistry, built from the stored live data on first use
+    """
+    global _registry
+    if _registry is None:
+        _registry = StationRegistry(load_frame('live'))
+    return _registry
+
+def set_registry(live_df):
+    """
+    Replaces the process wide StationRegistry with one built from a new live snapshot
+    """
+    global _registry
+    _registry = StationRegistry(live_df)
+    return _registry
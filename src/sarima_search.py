@@ -0,0 +1,224 @@
+import pandas as pd
+import numpy as np
+import itertools
+import json
+import os
+import time
+import hashlib
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+#root of memoized fit results, one json file per series and model settings
+SARIMA_DIR = 'data/store/sarima'
+
+#model settings of the 02_modeling grid search
+FIT_PARAMS = {'enforce_invertibility':False, 'enforce_stationarity':False}
+
+def order_grid(max_order=2, max_seasonal_order=2, period=24):
+    """
+    Returns (orders, seasonal_orders) lists covering every (p,d,q) and (P,D,Q,period)
+    combination up to the given orders, as in the 02_modeling grid
+    """
+    orders = list(itertools.product(range(max_order + 1), repeat=3))
+    seasonal_orders = [order + (period,) for order in itertools.product(range(max_seasonal_order + 1), repeat=3)]
+    return orders, seasonal_orders
+
+def series_key(ts, params=FIT_PARAMS):
+    """
+    Returns hash identifying a series' values and the model settings it is fit with
+    """
+    sha1 = hashlib.sha1(np.ascontiguousarray(np.asarray(ts, dtype=np.float64)).tobytes())
+    sha1.update(json.dumps(params, sort_keys=True).encode())
+    return sha1.hexdigest()[:16]
+
+class _OverBudget(Exception):
+    pass
+
+def fit_candidate(args):
+    """
+    Fits one SARIMAX candidate and returns dict of its order, seasonal_order, aic, bic, seconds and
+    status: 'ok', 'timeout' (abandoned once the time budget ran out), 'not_converged' or 'error'
+    """
+    values, order, seasonal_order, params, maxiter, time_budget = args
+    started = time.perf_counter()
+    result = {'order':tuple(order), 'seasonal_order':tuple(seasonal_order), 'aic':np.nan, 'bic':np.nan}
+
+    def check_budget(_):
+        if time_budget is not None and time.perf_counter() - started > time_budget:
+            raise _OverBudget()
+
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            fit_kwargs = {} if maxiter is None else {'maxiter':maxiter}
+            fit = SARIMAX(values, order=order, seasonal_order=seasonal_order, **params) \
+                .fit(disp=False, callback=check_budget, **fit_kwargs)
+        result.update({'aic':fit.aic, 'bic':fit.bic,
+                       'status':'ok' if fit.mle_retvals.get('converged', True) else 'not_converged'})
+    except _OverBudget:
+        result['status'] = 'timeout'
+        result['time_budget'] = time_budget
+    except Exception as e:
+        result['status'] = f'error: {type(e).__name__}: {e}'
+    result['seconds'] = time.perf_counter() - started
+    return result
+
+class FitCache(object):
+    """
+    Memo of final fit results keyed by (series hash, order, seasonal_order), kept in memory
+    and in one json file per series under cache_dir
+    """
+
+    def __init__(self, cache_dir=SARIMA_DIR):
+        self.cache_dir = cache_dir
+        self.memo = {}
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + '.json')
+
+    def results(self, key):
+        """
+        Returns dict of {(order, seasonal_order): result} memoized for a series
+        """
+        if key not in self.memo:
+            self.memo[key] = {}
+            if self.cache_dir is not None and os.path.exists(self._path(key)):
+                with open(self._path(key)) as f:
+                    for result in json.load(f):
+                        result['order'], result['seasonal_order'] = tuple(result['order']), tuple(result['seasonal_order'])
+                        result['aic'], result['bic'] = [np.nan if result[ic] is None else result[ic] for ic in ['aic','bic']]
+                        self.memo[key][(result['order'], result['seasonal_order'])] = result
+        return self.memo[key]
+
+    def add(self, key, results):
+        """
+        Memoizes results of a series and rewrites its file atomically
+        """
+        memo = self.results(key)
+        for result in results:
+            memo[(result['order'], result['seasonal_order'])] = result
+        if self.cache_dir is None:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = self._path(key) + f'.{os.getpid()}.tmp'
+        with open(tmp,'w') as f:
+            json.dump([{**result, 'aic':None if np.isnan(result['aic']) else result['aic'],
+                        'bic':None if np.isnan(result['bic']) else result['bic']} for result in memo.values()], f)
+        os.replace(tmp, self._path(key))
+
+#process wide memo shared by every search
+_cache = FitCache()
+
+def _reusable(memo, candidate, time_budget):
+    """
+    Returns True if a memoized result answers a candidate, timeouts are refit under a larger time budget
+    """
+    result = memo.get(candidate)
+    if result is None:
+        return False
+    if result['status'] == 'timeout':
+        return time_budget is not None and time_budget <= result.get('time_budget', 0)
+    return True
+
+def _map(func, tasks, n_jobs):
+    if n_jobs == 1 or len(tasks) <= 1:
+        return [func(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=min(n_jobs, len(tasks))) as pool:
+        return list(pool.map(func, tasks))
+
+def search_sarima(ts, orders=None, seasonal_orders=None, params=FIT_PARAMS, time_budget=60, screen_iter=5,
+                  margin=20, n_jobs=-1, cache=None):
+    """
+    Returns DataFrame of SARIMAX candidates sorted by AIC with columns order, seasonal_order, aic, bic,
+    seconds and status, searching the grid over a process pool
+
+    Every candidate is first screened with a few optimizer iterations. Candidates whose screening AIC is
+    more than margin above the best one found are abandoned (status 'abandoned', aic of the screening fit)
+    and only the rest are fit fully. Each fit stops once it runs past time_budget seconds. Final results
+    are memoized by (series hash, order, seasonal_order), so repeated or overlapping searches on the same
+    series only fit new candidates
+
+    ---Params---
+
+    ts: pandas Series or array, series to model (ex. Station(3172).avail_bikes_ts(time_interval=...))
+
+    orders, seasonal_orders: lists of (p,d,q) and (P,D,Q,s) tuples, default to order_grid()
+
+    params: dict, SARIMAX keyword arguments
+
+    time_budget: float, max seconds per fit, None for no limit
+
+    screen_iter: int, optimizer iterations of the screening fits
+
+    margin: float, AIC margin above the best screening fit to keep a candidate, None fits every candidate fully
+
+    n_jobs: int, number of worker processes, -1 uses every core and 1 runs serially in this process
+
+    cache: FitCache, defaults to the process wide cache under SARIMA_DIR
+    """
+    cache = _cache if cache is None else cache
+    if n_jobs is None or n_jobs < 1:
+        n_jobs = os.cpu_count()
+    if orders is None or seasonal_orders is None:
+        default_orders, default_seasonal = order_grid()
+        orders = default_orders if orders is None else orders
+        seasonal_orders = default_seasonal if seasonal_orders is None else seasonal_orders
+
+    values = np.asarray(ts, dtype=np.float64)
+    key = series_key(values, params)
+    memo = cache.results(key)
+
+    candidates = [(tuple(order), tuple(seasonal)) for order in orders for seasonal in seasonal_orders]
+    done = [memo[candidate] for candidate in candidates if _reusable(memo, candidate, time_budget)]
+    pending = [candidate for candidate in candidates if not _reusable(memo, candidate, time_budget)]
+
+    abandoned = []
+    if margin is not None and pending:
+        #screening fits are memoized under their own key so abandoned candidates are not rescreened
+        screen_key = series_key(values, {**params, 'screen_iter':screen_iter})
+        screen_memo = cache.results(screen_key)
+        unscreened = [candidate for candidate in pending if not _reusable(screen_memo, candidate, time_budget)]
+        cache.add(screen_key, _map(fit_candidate, [(values, order, seasonal, params, screen_iter, time_budget)
+                                                   for order, seasonal in unscreened], n_jobs))
+        screens = [screen_memo[candidate] for candidate in pending]
+
+        best = np.nanmin([result['aic'] for result in screens + done] + [np.inf])
+        failed = [result for result in screens if np.isnan(result['aic'])]
+        abandoned = [{**result, 'status':'abandoned'} for result in screens if result['aic'] > best + margin]
+        pending = [candidate for candidate, result in zip(pending, screens) if result['aic'] <= best + margin]
+        #candidates that failed or ran out of time while screening are final, a full fit would fail too
+        cache.add(key, failed)
+        done += failed
+
+    fits = _map(fit_candidate, [(values, order, seasonal, params, None, time_budget) for order, seasonal in pending], n_jobs)
+    cache.add(key, fits)
+
+    #abandoned candidates only have the aic of a partial fit, so they rank after every full fit
+    columns = ['order','seasonal_order','aic','bic','seconds','status']
+    fitted = pd.DataFrame(done + fits, columns=columns).sort_values('aic', na_position='last', kind='mergesort')
+    abandoned = pd.DataFrame(abandoned, columns=columns).sort_values('aic', kind='mergesort')
+    return pd.concat([fitted, abandoned]).reset_index(drop=True)
+
+def search_stations(station_mat, stations=None, time_interval=None, **kwargs):
+    """
+    Returns DataFrame of the best SARIMAX candidate per station column of a time x station matrix
+
+    ---Params---
+
+    station_mat: DataFrame, time x station matrix (ex. build_station_matrix().frame())
+
+    stations: list of station columns to search, if None all
+
+    time_interval: ('YYYY-MM-DD HH:MM','YYYY-MM-DD HH:MM'), tuple of 2 strings, training window
+
+    kwargs: passed to search_sarima
+    """
+    if time_interval is not None:
+        station_mat = station_mat[time_interval[0]:time_interval[1]]
+    rows = []
+    for station in station_mat.columns if stations is None else stations:
+        #missing values are kept, SARIMAX skips them in the kalman filter
+        best = search_sarima(station_mat[station], **kwargs).iloc[0]
+        rows.append({'station':station, **best.to_dict()})
+    return pd.DataFrame(rows).set_index('station')
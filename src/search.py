@@ -0,0 +1,86 @@
+import numpy as np
+import re
+
+#common street name words -> abbreviation used in citibike station names
+ABBREVIATIONS = {'street':'st', 'avenue':'ave', 'av':'ave', 'place':'pl', 'road':'rd',
+                 'boulevard':'blvd', 'west':'w', 'east':'e', 'north':'n', 'south':'s',
+                 'and':'', 'at':''}
+
+def normalize(name):
+    """
+    Returns lowercase tokens of a station name with punctuation removed, street words
+    abbreviated and ordinal suffixes dropped (ex. 'W 74th Street & Columbus Ave' -> ['w','74','st','columbus','ave'])
+    """
+    tokens = re.sub(r'[^a-z0-9 ]', ' ', name.lower()).split()
+    tokens = [re.sub(r'^(\d+)(st|nd|rd|th)$', r'\1', token) for token in tokens]
+    tokens = [ABBREVIATIONS.get(token, token) for token in tokens]
+    return [token for token in tokens if token]
+
+def trigrams(tokens):
+    """
+    Returns set of padded character trigrams of each token. Grams never span two tokens so
+    token order (ex. cross street order) does not change the set
+    """
+    grams = set()
+    for token in tokens:
+        padded = f'  {token} '
+        grams.update(padded[i:i+3] for i in range(len(padded) - 2))
+    return grams
+
+class StationNameIndex(object):
+    """
+    In memory trigram index over station names for case insensitive, typo tolerant and
+    cross street order independent search
+
+    Each trigram maps to a numpy array of the stations containing it, so a query is a
+    bincount over the posting lists of its trigrams
+    """
+
+    def __init__(self, names, station_ids):
+        """
+        ---Params---
+
+        names: list of str, station names
+
+        station_ids: list, station ids aligned with names
+        """
+        self.names = np.asarray(names, dtype=object)
+        self.station_ids = np.asarray(station_ids)
+
+        postings = {}
+        sizes = []
+        for i, name in enumerate(self.names):
+            grams = trigrams(normalize(name))
+            sizes.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(i)
+
+        self.postings = {gram:np.array(stations, dtype=np.int32) for gram, stations in postings.items()}
+        self.sizes = np.array(sizes, dtype=np.float64)
+
+    def search(self, query, limit=10, min_score=0.3):
+        """
+        Returns list of (station_id, station_name, score) best matches for query, ranked by score
+
+        Score is the share of the query's trigrams found in the name, lightly weighted by
+        the share of the name the query covers so shorter exact names rank first
+
+        ---Params---
+
+        query: str, any part of a station name in any case or cross street order (ex. 'Columbus & W 74')
+
+        limit: int, max number of results
+
+        min_score: float, minimum score returned
+        """
+        query_grams = trigrams(normalize(query))
+        grams = [gram for gram in query_grams if gram in self.postings]
+        if not grams:
+            return []
+
+        hits = np.bincount(np.concatenate([self.postings[gram] for gram in grams]), minlength=len(self.names))
+        score = 0.8 * hits / len(query_grams) + 0.2 * hits / np.maximum(self.sizes, 1)
+
+        candidates = np.flatnonzero(score >= min_score)
+        best = candidates[np.argsort(-score[candidates], kind='mergesort')][:limit]
+        return [(self.station_ids[i], self.names[i], float(score[i])) for i in best]
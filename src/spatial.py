@@ -0,0 +1,116 @@
+import pandas as pd
+import numpy as np
+from scipy.spatial import cKDTree
+
+#mean earth radius in meters
+EARTH_RADIUS = 6371008.8
+
+def haversine(lat1, lon1, lat2, lon2):
+    """
+    Returns great circle distance in meters between coordinates given in degrees, vectorized over arrays
+    """
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2)**2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(a))
+
+def to_xyz(lat, lon):
+    """
+    Returns unit sphere cartesian coordinates, where straight line distance orders points
+    the same as great circle distance
+    """
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+def chord(meters):
+    """
+    Returns unit sphere straight line distance matching a great circle distance in meters
+    """
+    return 2 * np.sin(np.asarray(meters) / (2 * EARTH_RADIUS))
+
+class StationSpatialIndex(object):
+    """
+    KD-tree over station coordinates for nearest station and radius queries
+
+    Stations are indexed on the unit sphere so queries are exact for great circle distance,
+    and returned distances are haversine meters
+    """
+
+    def __init__(self, station_ids, lat, lon, avail_bikes=None, avail_docks=None):
+        """
+        ---Params---
+
+        station_ids, lat, lon: array-like, aligned station ids and coordinates in degrees
+
+        avail_bikes, avail_docks: array-like, aligned live availability used by nearest_available
+        """
+        self.station_ids = np.asarray(station_ids)
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.avail_bikes = None if avail_bikes is None else np.asarray(avail_bikes)
+        self.avail_docks = None if avail_docks is None else np.asarray(avail_docks)
+        self.tree = cKDTree(to_xyz(self.lat, self.lon))
+
+    @classmethod
+    def from_live(cls, live_df):
+        """
+        Builds index from a live station DataFrame (see cleaning.station_initalize)
+        """
+        return cls(live_df.station_id.values, live_df.lat.values, live_df.lon.values,
+                   live_df.num_bikes_available.values, live_df.num_docks_available.values)
+
+    def _result(self, positions, lat, lon):
+        positions = np.asarray(positions, dtype=np.int64)
+        return pd.DataFrame({'station_id':self.station_ids[positions],
+                             'distance':haversine(lat, lon, self.lat[positions], self.lon[positions])})
+
+    def nearest(self, lat, lon, k=5):
+        """
+        Returns DataFrame of station_id and distance (meters) of the k stations nearest to a point
+        """
+        k = min(k, len(self.station_ids))
+        _, positions = self.tree.query(to_xyz(lat, lon)[0], k=k)
+        return self._result(np.atleast_1d(positions), lat, lon)
+
+    def within(self, lat, lon, radius):
+        """
+        Returns DataFrame of station_id and distance (meters) of stations within radius meters of a point,
+        nearest first
+        """
+        positions = self.tree.query_ball_point(to_xyz(lat, lon)[0], chord(radius))
+        result = self._result(positions, lat, lon)
+        return result.sort_values('distance', kind='mergesort').reset_index(drop=True)
+
+    def nearest_available(self, lat, lon, min_bikes=0, min_docks=0, k=1):
+        """
+        Returns DataFrame of station_id and distance (meters) of the k stations nearest to a point
+        with at least min_bikes available bikes and min_docks available docks
+
+        Candidates are taken nearest first in growing batches, so a well supplied neighborhood
+        only costs one small tree query
+        """
+        eligible = np.ones(len(self.station_ids), dtype=bool)
+        if min_bikes:
+            eligible &= self.avail_bikes >= min_bikes
+        if min_docks:
+            eligible &= self.avail_docks >= min_docks
+
+        n = len(self.station_ids)
+        batch = min(max(4 * k, 16), n)
+        while True:
+            _, positions = self.tree.query(to_xyz(lat, lon)[0], k=batch)
+            positions = np.atleast_1d(positions)
+            found = positions[eligible[positions]]
+            if len(found) >= k or batch == n:
+                return self._result(found[:k], lat, lon)
+            batch = min(batch * 4, n)
+
+    def neighbors(self, k=5):
+        """
+        Returns (station_ids x k) matrices of the k nearest other stations to every station and
+        their distances in meters, in one vectorized query
+        """
+        k = min(k, len(self.station_ids) - 1)
+        _, positions = self.tree.query(self.tree.data, k=k + 1)
+        positions = positions.reshape(len(self.station_ids), -1)[:, 1:]
+        distances = haversine(self.lat[:, None], self.lon[:, None], self.lat[positions], self.lon[positions])
+        return self.station_ids[positions], distances
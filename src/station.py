@@ -3,35 +3,63 @@ import matplotlib.pyplot as plt
 import numpy as np
 from pickle import load, dump
 from src.cleaning import *
+from src.registry import get_registry
+from src.provider import get_provider
+from src.station_set import StationSet, interval_bounds
+from src.stationarity import stationarity_table
+from src.decomposition import decompose_matrix, seasonal_profiles, plot_decomposition
+from src.station_matrix import build_station_matrix, StationMatrix
 
 from statsmodels.tsa.stattools import adfuller
 from statsmodels.tsa.seasonal import seasonal_decompose
 from statsmodels.graphics.tsaplots import plot_pacf, plot_acf
 
-def search_station_id(query):
+def search_station_id(query, limit=10):
     """
-    Returns station ids given a particular string as query
+    Returns station names and ids best matching a particular string as query, ranked by match.
+    Case insensitive, typo tolerant and independent of cross street order (ex. 'Columbus & W 74')
     """
-    live = load(open('data/pickle/live.pickle','rb'))
-    return live.loc[live.station_name.str.contains(query)][['station_name','station_id']]
+    results = get_registry().name_index.search(query, limit)
+    return pd.DataFrame([(name, station_id) for station_id, name, _ in results], columns=['station_name','station_id'])
 
 def search_station_name(query):
     """
     Returns station name given a particular id as query
     """
-    live = load(open('data/pickle/live.pickle','rb'))
-    return live.loc[live.station_id == int(query)].station_name.values
+    record = get_registry().get(query)
+    return np.array([] if record is None else [record['station_name']], dtype=object)
 
 def get_lon_lat(id):
     """
     Returns Longitude and Latitude coordinates as a tuple given a station id
     """
-    live = load(open('data/pickle/live.pickle','rb'))
+    record = get_registry().get(id)
     
-    try:
-        return (float(live.loc[live.station_id == id].lat.values), float(live.loc[live.station_id == id].lon.values))
-    except:
+    if record is None:
         return None
+    return (float(record['lat']), float(record['lon']))
+
+def nearest_stations(lat, lon, k=5, min_bikes=0, min_docks=0):
+    """
+    Returns station ids, names and distances (meters) of the k live stations nearest to a point,
+    optionally only those with at least min_bikes bikes or min_docks docks available
+    """
+    registry = get_registry()
+    if min_bikes or min_docks:
+        result = registry.spatial_index.nearest_available(lat, lon, min_bikes, min_docks, k)
+    else:
+        result = registry.spatial_index.nearest(lat, lon, k)
+    result.insert(1, 'station_name', [registry[station_id]['station_name'] for station_id in result.station_id])
+    return result
+
+def stations_within(lat, lon, radius):
+    """
+    Returns station ids, names and distances (meters) of live stations within radius meters of a point
+    """
+    registry = get_registry()
+    result = registry.spatial_index.within(lat, lon, radius)
+    result.insert(1, 'station_name', [registry[station_id]['station_name'] for station_id in result.station_id])
+    return result
 
 def dickey_fuller(ts):
         dftest = adfuller(ts)
@@ -53,35 +81,58 @@ def dickey_fuller(ts):
                
         return dfoutput
 
+class _Dataset(object):
+    """
+    Class attribute resolving to a dataset of the process wide DataProvider on access
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        return get_provider().get(self.name)
+
 class Station(object):
     
-    live = load(open('data/pickle/live.pickle','rb'))
-    starts = load(open('data/starts.pickle','rb'))
-    ends = load(open('data/pickle/ends.pickle','rb'))
-    historical = load(open('data/pickle/historical.pickle','rb'))
+    live = _Dataset('live')
+    trips = _Dataset('trips')
+    historical = _Dataset('historical')
+    trip_index = _Dataset('trip_index')
+    flow_cube = _Dataset('flow_cube')
 
     def __init__(self, station_id):
         self.id = station_id
-        self.name = self.live.loc[self.live.station_id == station_id].station_name.values[0]
-        self.ts_starts = self.starts.loc[int(station_id)]
-        self.ts_ends = self.ends.loc[int(station_id)]
-        self.ts_bikes = self.historical.loc[int(station_id)]
-        self.lat = self.live.loc[self.live.station_id == station_id].lat.values[0]
-        self.lon = self.live.loc[self.live.station_id == station_id].lon.values[0]
-        self.capacity = self.live.loc[self.live.station_id == station_id].capacity.values[0]
-        self.station_type = self.live.loc[self.live.station_id == station_id].station_type.values[0]
-        self.legacy_id = self.live.loc[self.live.station_id == station_id].legacy_id_x.values[0]
-        self.has_kiosk = self.live.loc[self.live.station_id == station_id].has_kiosk.values[0]
-        self.region_id = self.live.loc[self.live.station_id == int(station_id)].region_id.values[0]
-        self.region_name = regions[self.region_id]
-        self.current_avail_bikes = self.live.loc[self.live.station_id == station_id].num_bikes_available.values[0]
-        self.current_disabled_bikes = self.live.loc[self.live.station_id == station_id].num_bikes_disabled.values[0]
-        self.current_avail_docks = self.live.loc[self.live.station_id == station_id].num_docks_available.values[0]
-        self.current_disabled_docks = self.live.loc[self.live.station_id == station_id].num_docks_disabled.values[0]
-        self.status = self.live.loc[self.live.station_id == station_id].station_status.values[0]
-        self.rental_methods = self.live.loc[self.live.station_id == station_id].rental_methods.values[0]
-        self.last_update = dt.datetime.fromtimestamp(self.live.loc[self.live.station_id == station_id].last_reported.values[0])
-        
+        record = get_registry()[station_id]
+        self.name = record['station_name']
+        self.lat = record['lat']
+        self.lon = record['lon']
+        self.capacity = record['capacity']
+        self.station_type = record['station_type']
+        self.legacy_id = record['legacy_id_x']
+        self.has_kiosk = record['has_kiosk']
+        self.region_id = record['region_id']
+        self.region_name = get_regions()[self.region_id]
+        self.current_avail_bikes = record['num_bikes_available']
+        self.current_disabled_bikes = record['num_bikes_disabled']
+        self.current_avail_docks = record['num_docks_available']
+        self.current_disabled_docks = record['num_docks_disabled']
+        self.status = record['station_status']
+        self.rental_methods = record['rental_methods']
+        self.last_update = dt.datetime.fromtimestamp(record['last_reported'])
+
+    @property
+    def ts_starts(self):
+        trips = self.trips
+        return trips.loc[trips.start_station_id.values == int(self.id)].set_index('starttime').sort_index()
+
+    @property
+    def ts_ends(self):
+        trips = self.trips
+        return trips.loc[trips.end_station_id.values == int(self.id)].set_index('stoptime').sort_index()
+
+    @property
+    def ts_bikes(self):
+        return self.historical.loc[int(self.id)]
     
     def info(self):
         """
@@ -109,23 +160,47 @@ class Station(object):
         Disabled Docks: {self.current_disabled_docks}
         """)
     
-    def net_bikes_ts(self, resample='H'):
+    def net_bikes_ts(self, resample='H', time_interval=None):
         """
         Returns a pandas Time Series of net bikes in/out per resample time period
         Positive value indicates net gain of bikes over resample time period 
         Negative value indicates net loss of bikes over resample time period
+
+        Results are memoized by the data provider until the trip datasets are replaced
         
         ---Params---
     
         resample: str, pandas date offset string, defaults to hourly ('H')
                     https://pandas.pydata.org/pandas-docs/stable/user_guide/timeseries.html#dateoffset-objects 
+
+        time_interval: ('YYYY-MM-DD HH:MM','YYYY-MM-DD HH:MM'), tuple of 2 strings, if None defaults to entire time series
         """
-        return self.ts_ends.resample(resample).tripduration.count() \
-            - self.ts_starts.resample(resample).tripduration.count()
+        key = ('net', int(self.id), resample, None if time_interval is None else tuple(time_interval))
+        return get_provider().memoize(key, lambda: self._net_bikes_ts(resample, time_interval),
+                                      ('trip_index','flow_cube')).copy()
+
+    def _net_bikes_ts(self, resample, time_interval):
+        if self.flow_cube.bucket_ratio(resample) is not None:
+            ts = self.flow_cube.net(self.id, resample)
+        else:
+            bounds = (None, None) if time_interval is None else interval_bounds(time_interval, resample)
+            try:
+                ts = self.trip_index.net_flow(self.id, resample, None if time_interval is None else bounds)
+            except ValueError:
+                #calendar frequencies (ex. 'M') have no fixed bin width
+                net = self.trip_index.net_counts(resample, [int(self.id)], *bounds)
+                ts = net[int(self.id)].rename('net_bikes') if int(self.id) in net else \
+                    pd.Series([], dtype=np.int64, index=pd.DatetimeIndex([]), name='net_bikes')
+        if time_interval is None:
+            return ts
+        return ts[time_interval[0]:time_interval[1]]
     
     def avail_bikes_ts(self, resample='H', time_interval=None):
         """
         Returns a pandas Time Series of average available bikes at station per resample time period
+
+        Only the reports needed for time_interval are resampled, onto the same bins resampling the
+        whole series gives, and results are memoized by the data provider until historical is replaced
         
         ---Params---
         
@@ -134,10 +209,19 @@ class Station(object):
         
         time_interval: ('YYYY-MM-DD HH:MM','YYYY-MM-DD HH:MM'), tuple of 2 strings, if None defaults to entire time series
         """
-        if time_interval == None:
-            return self.historical.loc[self.id].avail_bikes.resample(resample).mean()
-        else:
-            return self.historical.loc[self.id].avail_bikes.resample(resample).mean()[time_interval[0]:time_interval[1]]
+        key = ('avail', int(self.id), resample, None if time_interval is None else tuple(time_interval))
+        return get_provider().memoize(key, lambda: self._avail_bikes_ts(resample, time_interval),
+                                      ('historical',)).copy()
+
+    def _avail_bikes_ts(self, resample, time_interval):
+        avail_bikes = self.ts_bikes.avail_bikes
+        if time_interval is None:
+            return avail_bikes.resample(resample).mean()
+        start, end = interval_bounds(time_interval, resample)
+        ts = avail_bikes.loc[start:end].resample(resample).mean()
+        #bins resampling the whole series gives, so gaps at the edges of the interval stay as NaN bins
+        grid = pd.Series(0, index=avail_bikes.index[[0, -1]]).resample(resample).mean().index
+        return ts.reindex(grid[grid.slice_indexer(time_interval[0], time_interval[1])])
     
     def plot_net_bikes(self, resample='H', time_interval=None):
         """
@@ -152,16 +236,11 @@ class Station(object):
 
         time_interval: ('YYYY-MM-DD HH:MM','YYYY-MM-DD HH:MM'), tuple of 2 strings, if None defaults to entire time series
         """
-        station_net = self.net_bikes_ts(resample)
+        station_net = self.net_bikes_ts(resample, time_interval)
         fig, ax = plt.subplots(figsize=(10,5))
-        if time_interval == None:
-            ax.plot(station_net)
-            ax.set_title(f'Net Bikes ({resample})\nStation {self.id}: {self.name}')
-            return ax
-        else:
-            ax.plot(station_net[time_interval[0]:time_interval[1]])
-            ax.set_title(f'Net Bikes ({resample})\nStation {self.id}: {self.name}')
-            return ax
+        ax.plot(station_net)
+        ax.set_title(f'Net Bikes ({resample})\nStation {self.id}: {self.name}')
+        return ax
             
     def plot_avail_bikes(self,resample='H',time_interval=None):
         """
@@ -174,16 +253,11 @@ class Station(object):
 
         time_interval: ('YYYY-MM-DD HH:MM','YYYY-MM-DD HH:MM'), tuple of 2 strings, if None defaults to entire time series
         """
-        station_avail = self.avail_bikes_ts(resample)
+        station_avail = self.avail_bikes_ts(resample, time_interval)
         fig, ax = plt.subplots(figsize=(10,5))
-        if time_interval == None:
-            ax.plot(station_avail)
-            ax.set_title(f'Total Bikes ({resample})\nStation {self.id}: {self.name}')
-            return ax
-        else:
-            ax.plot(station_avail[time_interval[0]:time_interval[1]])
-            ax.set_title(f'Total Bikes ({resample})\nStation {self.id}: {self.name}')
-            return ax
+        ax.plot(station_avail)
+        ax.set_title(f'Total Bikes ({resample})\nStation {self.id}: {self.name}')
+        return ax
         
     def availbike_stationarity(self,resample='H',time_interval=None, window = 6):
         """
@@ -198,10 +272,7 @@ class Station(object):
         
         window: int, window used in rolling calculation
         """
-        if time_interval == None:
-            ts = self.avail_bikes_ts(resample=resample)
-        else:
-            ts = self.avail_bikes_ts(resample=resample)[time_interval[0]:time_interval[1]]
+        ts = self.avail_bikes_ts(resample=resample, time_interval=time_interval)
         
         #Plot time series, rolling mean, rolling std
         roll_mean = ts.rolling(window=window).mean()
@@ -241,10 +312,7 @@ class Station(object):
 
         time_interval: tuple of 2 strings, ('YYYY-MM-DD HH:MM','YYYY-MM-DD HH:MM'), if None defaults to entire time series
         """
-        if time_interval == None:
-            ts = self.avail_bikes_ts(resample=resample)
-        else:
-            ts = self.avail_bikes_ts(resample=resample)[time_interval[0]:time_interval[1]]
+        ts = self.avail_bikes_ts(resample=resample, time_interval=time_interval)
             
         decomposition = seasonal_decompose(ts)
 
@@ -281,10 +349,7 @@ class Station(object):
         
         window: int, window used in rolling calculation
         """
-        if time_interval == None:
-            ts = self.net_bikes_ts(resample=resample)
-        else:
-            ts = self.net_bikes_ts(resample=resample)[time_interval[0]:time_interval[1]]
+        ts = self.net_bikes_ts(resample=resample, time_interval=time_interval)
         
         #Plot time series, rolling mean, rolling std
         roll_mean = ts.rolling(window=window).mean()
@@ -324,10 +389,7 @@ class Station(object):
 
         time_interval: tuple of 2 strings, ('YYYY-MM-DD HH:MM','YYYY-MM-DD HH:MM'), if None defaults to entire time series
         """
-        if time_interval == None:
-            ts = self.net_bikes_ts(resample=resample)
-        else:
-            ts = self.net_bikes_ts(resample=resample)[time_interval[0]:time_interval[1]]
+        ts = self.net_bikes_ts(resample=resample, time_interval=time_interval)
             
         decomposition = seasonal_decompose(ts)
 
@@ -355,15 +417,11 @@ class Station(object):
         """
         Updates bike & dock status at stations and returns new live bike df
         """
-        df = station_initalize()
-        live = df
-        self.current_avail_bikes = df.loc[df.station_id == self.id].num_bikes_available
-        self.current_disabled_bikes = df.loc[df.station_id == self.id].num_bikes_available
-        self.current_avail_docks = df.loc[df.station_id == self.id].num_docks_available
-        self.current_disabled_docks = df.loc[df.station_id == self.id].num_docks_disabled
-
-        pickle_out = open('../data/pickle/live.pickle','wb')
-        pickle.dump(df,pickle_out)
-        pickle_out.close()
-
-        return df
\ No newline at end of file
+        df = get_provider().refresh_live()
+        record = get_registry()[self.id]
+        self.current_avail_bikes = record['num_bikes_available']
+        self.current_disabled_bikes = record['num_bikes_disabled']
+        self.current_avail_docks = record['num_docks_available']
+        self.current_disabled_docks = record['num_docks_disabled']
+
+        return df
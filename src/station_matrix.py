@@ -0,0 +1,243 @@
+import pandas as pd
+import numpy as np
+import json
+import os
+import hashlib
+from src.store import save_frame, load_frame, has_frame, PICKLES, STORE_DIR
+from src.cleaning import load_manifest, HISTORICAL_FILEPATHS
+from src.provider import get_provider
+from src.station_set import StationSet
+
+#root of cached station matrices, one directory per source and parameter key
+STATION_MATRIX_DIR = 'data/store/station_matrix'
+
+def missing_runs(mask):
+    """
+    Returns (columns, starts, lengths) arrays of every run of missing values in a
+    time x station boolean array, ordered by column then time
+    """
+    n, n_stations = mask.shape
+    padded = np.zeros((n_stations, n + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask.T
+    edges = np.diff(padded, axis=1)
+    columns, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    return columns, starts, ends - starts
+
+def gap_stats(mask):
+    """
+    Returns DataFrame of missing data statistics per station of a time x station missing mask
+
+    Columns: n_missing, pct_missing, n_gaps, longest_gap, mean_gap, leading_gap (missing rows before
+    the first report, ex. installed late), trailing_gap (missing rows after the last report,
+    ex. discontinued), interior_missing (missing rows between the first and last report)
+    """
+    values = mask.to_numpy(dtype=bool)
+    n, n_stations = values.shape
+    columns, starts, lengths = missing_runs(values)
+
+    n_missing = values.sum(axis=0)
+    n_gaps = np.bincount(columns, minlength=n_stations)
+    longest = np.zeros(n_stations, dtype=np.int64)
+    np.maximum.at(longest, columns, lengths)
+    leading = np.zeros(n_stations, dtype=np.int64)
+    leading[columns[starts == 0]] = lengths[starts == 0]
+    trailing = np.zeros(n_stations, dtype=np.int64)
+    trailing[columns[starts + lengths == n]] = lengths[starts + lengths == n]
+    #a station with no reports is one run that is both leading and trailing
+    trailing[n_missing == n] = 0
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        stats = pd.DataFrame({'n_missing':n_missing,
+                              'pct_missing':n_missing / max(n, 1),
+                              'n_gaps':n_gaps,
+                              'longest_gap':longest,
+                              'mean_gap':np.where(n_gaps > 0, n_missing / n_gaps, 0.0),
+                              'leading_gap':leading,
+                              'trailing_gap':trailing,
+                              'interior_missing':n_missing - leading - trailing}, index=mask.columns)
+    return stats
+
+def interpolate_gaps(values, mask, limit=None):
+    """
+    Returns copy of a time x station array with interior gaps of at most limit rows filled by
+    linear interpolation. Longer gaps are left missing as a whole rather than partly filled,
+    and missing rows before a station's first or after its last report are never filled
+
+    ---Params---
+
+    values: 2d numpy array, time x station
+
+    mask: 2d boolean numpy array, True where values are missing
+
+    limit: int, max gap length filled, None fills every interior gap and 0 fills none
+    """
+    filled = values.copy()
+    if limit == 0:
+        return filled
+
+    columns, starts, lengths = missing_runs(mask)
+    n = len(values)
+    fill = (starts > 0) & (starts + lengths < n)
+    if limit is not None:
+        fill &= lengths <= limit
+    if not fill.any():
+        return filled
+
+    #every row of each filled gap, interpolated between the reports on either side
+    columns, starts, lengths = columns[fill], starts[fill], lengths[fill]
+    gap = np.repeat(np.arange(len(lengths)), lengths)
+    step = np.arange(len(gap)) - np.repeat(np.cumsum(lengths) - lengths, lengths) + 1
+    rows = np.repeat(starts, lengths) + step - 1
+    cols = columns[gap]
+    before = values[starts - 1, columns][gap]
+    after = values[starts + lengths, columns][gap]
+    filled[rows, cols] = before + (after - before) * step / (lengths[gap] + 1)
+    return filled
+
+class StationMatrix(object):
+    """
+    Time x station matrix of average available bikes with a parallel missing data mask
+
+    values is float32 with short gaps interpolated, mask is True where the station had no
+    reports in the period before interpolation. Columns are station ids as str
+    """
+
+    def __init__(self, values, mask, freq, limit):
+        self.values = values
+        self.mask = mask
+        self.freq = freq
+        self.limit = limit
+        self._gaps = None
+
+    @property
+    def gaps(self):
+        """
+        DataFrame of missing data statistics per station (see gap_stats)
+        """
+        if self._gaps is None:
+            self._gaps = gap_stats(self.mask)
+        return self._gaps
+
+    def select(self, max_missing=0.05, max_gap=None, time_interval=None, drop_constant=True):
+        """
+        Returns list of station columns with enough data to model, replacing the hand picked
+        drop lists of the modeling notebooks
+
+        ---Params---
+
+        max_missing: float, max share of rows missing before interpolation
+
+        max_gap: int, max rows of the longest gap before interpolation, None for no limit
+
+        time_interval: ('YYYY-MM-DD HH:MM','YYYY-MM-DD HH:MM'), tuple of 2 strings, checks only this interval
+
+        drop_constant: bool, if True also drops stations whose values never change (nothing to model)
+        """
+        mask, values = self.mask, self.values
+        if time_interval is not None:
+            mask = mask[time_interval[0]:time_interval[1]]
+            values = values[time_interval[0]:time_interval[1]]
+        stats = self.gaps if time_interval is None else gap_stats(mask)
+
+        keep = stats.pct_missing <= max_missing
+        if max_gap is not None:
+            keep &= stats.longest_gap <= max_gap
+        if drop_constant:
+            keep &= (values.max() > values.min()).values
+        return list(stats.index[keep.values])
+
+    def frame(self, columns=None, time_interval=None):
+        """
+        Returns interpolated values as a DataFrame, optionally only some columns and an interval
+        """
+        values = self.values if columns is None else self.values[columns]
+        if time_interval is not None:
+            values = values[time_interval[0]:time_interval[1]]
+        return values
+
+    def save(self, path):
+        """
+        Writes values and mask to the columnar store under path
+        """
+        save_frame(self.values, 'values', path)
+        save_frame(self.mask, 'mask', path)
+        with open(os.path.join(path, 'params.json'),'w') as f:
+            json.dump({'freq':self.freq, 'limit':self.limit}, f)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads a matrix written by save, memory mapped
+        """
+        with open(os.path.join(path, 'params.json')) as f:
+            params = json.load(f)
+        values = load_frame('values', store_dir=path)
+        mask = load_frame('mask', store_dir=path)
+        values.index.freq = mask.index.freq = params['freq']
+        return cls(values, mask, params['freq'], params['limit'])
+
+def source_signature():
+    """
+    Returns dict identifying the historical data a matrix is built from: manifest hashes of the
+    station log source files and the size and modified time of the stored historical data
+    """
+    manifest = load_manifest()
+    signature = {'sources':{path:manifest[path]['sha1'] for path in HISTORICAL_FILEPATHS if path in manifest}}
+
+    if has_frame('historical'):
+        stored = os.path.join(STORE_DIR, 'historical', 'meta.json')
+    else:
+        stored = PICKLES['historical']
+    if os.path.exists(stored):
+        stat = os.stat(stored)
+        signature['historical'] = [stat.st_size, stat.st_mtime]
+    return signature
+
+def matrix_key(freq, limit):
+    """
+    Returns cache key of a station matrix for the current source data and parameters
+    """
+    key = json.dumps({'source':source_signature(), 'freq':freq, 'limit':limit}, sort_keys=True)
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+def build_station_matrix(freq='H', limit=3, cache_dir=STATION_MATRIX_DIR, provider=None):
+    """
+    Returns StationMatrix of average available bikes per station at freq, reusing the cached
+    matrix on disk when the source data and parameters are unchanged
+
+    ---Params---
+
+    freq: str, pandas date offset string, defaults to hourly ('H')
+
+    limit: int, max gap length in rows filled by interpolation, None fills every interior gap
+           and 0 fills none
+
+    cache_dir: str, root directory of cached matrices, None disables the cache
+
+    provider: DataProvider, defaults to the process wide provider (see src.provider). Matrices
+              built from injected historical data are never cached
+    """
+    provider = get_provider() if provider is None else provider
+    if provider.is_injected('historical'):
+        cache_dir = None
+
+    if cache_dir is not None:
+        path = os.path.join(cache_dir, matrix_key(freq, limit))
+        if os.path.exists(os.path.join(path, 'params.json')):
+            return StationMatrix.load(path)
+
+    avail_bikes = StationSet(provider=provider).avail_bikes(freq)
+    avail_bikes.columns = [str(col) for col in avail_bikes.columns]
+
+    missing = avail_bikes.isna().to_numpy()
+    values = interpolate_gaps(avail_bikes.to_numpy(dtype=np.float64), missing, limit).astype(np.float32)
+
+    matrix = StationMatrix(pd.DataFrame(values, index=avail_bikes.index, columns=avail_bikes.columns),
+                           pd.DataFrame(missing, index=avail_bikes.index, columns=avail_bikes.columns),
+                           freq, limit)
+
+    if cache_dir is not None:
+        #params.json is written last so a partly written matrix is never loaded
+        matrix.save(path)
+    return matrix
@@ -0,0 +1,131 @@
+import pandas as pd
+import numpy as np
+from pandas.tseries.frequencies import to_offset
+from src.provider import get_provider
+
+def interval_bounds(time_interval, resample):
+    """
+    Returns (start, end) timestamps of the raw data needed to resample time_interval, widened to
+    whole resample periods so periods at the edges of the interval are complete. Either bound is
+    None when it cannot be determined for the resample rule
+
+    ---Params---
+
+    time_interval: ('YYYY-MM-DD HH:MM','YYYY-MM-DD HH:MM'), tuple of 2 strings, partial dates cover the whole period
+                   (ex. '2018-01-10' ends at the end of that day) as in pandas string slicing
+
+    resample: str, pandas date offset string
+    """
+    start, end = pd.Period(time_interval[0]).start_time, pd.Period(time_interval[1]).end_time
+    try:
+        step = pd.Timedelta(to_offset(resample).nanos, unit='ns')
+        return start.floor(step), end.floor(step) + step
+    except ValueError:
+        pass
+    try:
+        #calendar frequencies (ex. 'M') have no fixed width, widen to the calendar periods instead
+        return pd.Period(start, freq=resample).start_time, pd.Period(end, freq=resample).end_time
+    except ValueError:
+        return None, None
+
+class StationSet(object):
+    """
+    Time series of many stations at once, as time x station matrices
+
+    Each matrix is built in one pass over the data (a flow cube rollup or a single
+    groupby/resample) instead of one Station per column
+    """
+
+    def __init__(self, station_ids=None, provider=None):
+        """
+        ---Params---
+
+        station_ids: list of station ids, if None every station in the data
+
+        provider: DataProvider, defaults to the process wide provider (see src.provider)
+        """
+        self.station_ids = None if station_ids is None else [int(station_id) for station_id in station_ids]
+        self.provider = provider
+
+    @property
+    def data(self):
+        return self.provider if self.provider is not None else get_provider()
+
+    def _select(self, df):
+        """
+        Returns rows of a (station id, time) multiindex frame belonging to the set's stations
+        """
+        if self.station_ids is None:
+            return df
+        return df.loc[df.index.get_level_values(0).isin(self.station_ids)]
+
+    @staticmethod
+    def _slice(df, time_interval, resample):
+        """
+        Returns rows of a (station id, time) multiindex frame needed to resample time_interval
+        """
+        if time_interval is None:
+            return df
+        start, end = interval_bounds(time_interval, resample)
+        times = df.index.get_level_values(1)
+        keep = np.ones(len(df), dtype=bool)
+        if start is not None:
+            keep &= times >= start
+        if end is not None:
+            keep &= times <= end
+        return df.loc[keep]
+
+    def _columns(self, matrix):
+        """
+        Orders matrix columns as the set's station ids
+        """
+        if self.station_ids is None:
+            return matrix.sort_index(axis=1)
+        return matrix.reindex(columns=pd.Index(self.station_ids, name='station_id'))
+
+    def net_bikes(self, resample='H', time_interval=None):
+        """
+        Returns time x station DataFrame of net bikes in/out per resample time period
+        Positive value indicates net gain of bikes over resample time period
+
+        ---Params---
+
+        resample: str, pandas date offset string, defaults to hourly ('H')
+
+        time_interval: ('YYYY-MM-DD HH:MM','YYYY-MM-DD HH:MM'), tuple of 2 strings, if None defaults to entire time series
+        """
+        flow_cube = self.data.flow_cube
+        if flow_cube.bucket_ratio(resample) is not None:
+            station_ids = None if self.station_ids is None else np.intersect1d(self.station_ids, flow_cube.stations)
+            matrix = flow_cube.net_matrix(resample, station_ids)
+        else:
+            #calendar frequencies (ex. 'M') have no fixed bin width
+            bounds = (None, None) if time_interval is None else interval_bounds(time_interval, resample)
+            matrix = self.data.trip_index.net_counts(resample, self.station_ids, *bounds).astype(np.int64)
+
+        matrix = self._columns(matrix).fillna(0)
+        if time_interval is not None:
+            matrix = matrix[time_interval[0]:time_interval[1]]
+        matrix.columns.name = 'station_id'
+        return matrix
+
+    def avail_bikes(self, resample='H', time_interval=None):
+        """
+        Returns time x station DataFrame of average available bikes per resample time period,
+        NaN where a station has no reports in a period
+
+        ---Params---
+
+        resample: str, pandas date offset string, defaults to hourly ('H')
+
+        time_interval: ('YYYY-MM-DD HH:MM','YYYY-MM-DD HH:MM'), tuple of 2 strings, if None defaults to entire time series
+        """
+        avail = self._slice(self._select(self.data.historical[['avail_bikes']]), time_interval, resample).avail_bikes
+        matrix = avail.groupby([avail.index.get_level_values(0), pd.Grouper(level=1, freq=resample)]).mean().unstack(0)
+        if len(matrix):
+            matrix = matrix.reindex(pd.date_range(matrix.index.min(), matrix.index.max(), freq=resample))
+        if time_interval is not None:
+            matrix = matrix[time_interval[0]:time_interval[1]]
+        matrix = self._columns(matrix)
+        matrix.columns.name = 'station_id'
+        return matrix
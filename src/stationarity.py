@@ -0,0 +1,85 @@
+import pandas as pd
+import numpy as np
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from statsmodels.tsa.stattools import adfuller, kpss
+
+def adf_test(ts, autolag='AIC', maxlag=None):
+    """
+    Returns dict of Augmented Dickey-Fuller test results for a series, without printing.
+    Null hypothesis is a unit root, so a small p-value suggests stationarity
+    """
+    stat, p_value, lags, nobs, crit, _ = adfuller(ts, maxlag=maxlag, autolag=autolag)
+    result = {'adf_stat':stat, 'adf_pvalue':p_value, 'adf_lags':lags, 'adf_nobs':nobs}
+    result.update({f'adf_crit_{key}':value for key, value in crit.items()})
+    return result
+
+def kpss_test(ts, regression='c', nlags='auto'):
+    """
+    Returns dict of KPSS test results for a series, without printing.
+    Null hypothesis is stationarity, so a small p-value suggests a unit root
+    """
+    with warnings.catch_warnings():
+        #p-values outside the lookup table are clipped to its bounds with a warning
+        warnings.simplefilter('ignore')
+        stat, p_value, lags, crit = kpss(ts, regression=regression, nlags=nlags)
+    result = {'kpss_stat':stat, 'kpss_pvalue':p_value, 'kpss_lags':lags}
+    result.update({f'kpss_crit_{key}':value for key, value in crit.items()})
+    return result
+
+def _test_column(args):
+    """
+    Runs the requested tests on one station column, recording failures instead of raising
+    """
+    name, values, use_kpss, alpha = args
+    values = values[~np.isnan(values)]
+    result = {'station':name, 'n_obs':len(values), 'error':None}
+    try:
+        result.update(adf_test(values))
+        result['adf_stationary'] = result['adf_pvalue'] < alpha
+        if use_kpss:
+            result.update(kpss_test(values))
+            result['kpss_stationary'] = result['kpss_pvalue'] >= alpha
+    except Exception as e:
+        result['error'] = f'{type(e).__name__}: {e}'
+    return result
+
+def stationarity_table(station_mat, use_kpss=False, alpha=0.05, n_jobs=-1):
+    """
+    Returns DataFrame of stationarity test results with one row per station column of a
+    time x station matrix, computed without printing or plotting
+
+    Columns are the ADF statistic, p-value, lags, observations and critical values, plus
+    adf_stationary (ADF null rejected at alpha). With use_kpss the matching kpss_ columns and
+    kpss_stationary (KPSS null not rejected at alpha) are added, along with stationary where
+    both tests agree. NaNs are dropped per column and stations whose test fails keep the
+    message in error
+
+    ---Params---
+
+    station_mat: DataFrame, time x station matrix (ex. StationSet.avail_bikes())
+
+    use_kpss: bool, if True also runs the KPSS test
+
+    alpha: float, significance level
+
+    n_jobs: int, number of worker processes, -1 uses every core and 1 runs serially in this process
+    """
+    if n_jobs is None or n_jobs < 1:
+        n_jobs = os.cpu_count()
+
+    values = station_mat.to_numpy(dtype=np.float64)
+    tasks = [(col, values[:, i], use_kpss, alpha) for i, col in enumerate(station_mat.columns)]
+
+    if n_jobs == 1:
+        rows = [_test_column(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            rows = list(pool.map(_test_column, tasks, chunksize=max(1, len(tasks) // (4 * n_jobs))))
+
+    results = pd.DataFrame(rows).set_index('station')
+    results.index.name = station_mat.columns.name
+    if use_kpss:
+        results['stationary'] = results.adf_stationary & results.kpss_stationary
+    return results
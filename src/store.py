@@ -0,0 +1,315 @@
+import pandas as pd
+import numpy as np
+import json
+import os
+import pickle
+import shutil
+import tempfile
+
+#columnar store of data artifacts, one directory per artifact
+STORE_DIR = 'data/store'
+
+#artifact name -> legacy pickle it replaces
+PICKLES = {'live':'data/pickle/live.pickle',
+           'trips':'data/pickle/trips.pickle',
+           'historical':'data/pickle/historical.pickle',
+           'system_forcast':'data/pickle/system_forcast.pickle',
+           'system_daily':'data/pickle/system_daily.pickle'}
+
+def new_version(path):
+    """
+    Returns a fresh, empty directory to write the next version of the artifact at path into.
+    Versions live in a .versions directory next to path and are published with publish_version
+    """
+    parent, name = os.path.split(os.path.abspath(path))
+    versions = os.path.join(parent, '.versions', name)
+    os.makedirs(versions, exist_ok=True)
+    version = tempfile.mkdtemp(dir=versions)
+    os.chmod(version, 0o755)
+    return version
+
+def publish_version(version, path):
+    """
+    Atomically switches the artifact at path to a fully written version directory
+
+    path is a symlink to its current version and is swapped with a rename, so readers see either
+    the old or the new version and files that are already memory mapped are never rewritten.
+    The version being replaced is kept for readers that opened it lazily, older ones are removed
+    """
+    parent, name = os.path.split(os.path.abspath(path))
+    previous = os.path.realpath(path) if os.path.islink(path) else None
+
+    link = version + '.link'
+    os.symlink(os.path.relpath(version, parent), link)
+    os.replace(link, path)
+
+    versions = os.path.dirname(version)
+    for entry in os.listdir(versions):
+        old = os.path.join(versions, entry)
+        if old not in (version, previous) and os.path.isdir(old):
+            #unlinked files stay valid for processes that still have them mapped
+            shutil.rmtree(old, ignore_errors=True)
+
+def _save_array(values, path):
+    """
+    Saves values as .npy when they have a fixed width dtype, otherwise pickles them.
+    Returns the storage kind
+    """
+    values = np.asarray(values)
+    if values.dtype.kind in 'biufcmM':
+        np.save(path + '.npy', np.ascontiguousarray(values))
+        return 'npy'
+    pickle_out = open(path + '.pickle','wb')
+    pickle.dump(values, pickle_out)
+    pickle_out.close()
+    return 'pickle'
+
+def _load_array(path, kind, mmap_mode):
+    """
+    Loads an array written by _save_array, memory mapped when stored as .npy
+    """
+    if kind == 'npy':
+        return np.load(path + '.npy', mmap_mode=mmap_mode)
+    return pickle.load(open(path + '.pickle','rb'))
+
+def _save_index(index, path):
+    """
+    Saves a pandas index (including MultiIndex levels and codes) and returns its metadata
+    """
+    if isinstance(index, pd.RangeIndex):
+        return {'type':'range', 'name':index.name,
+                'start':int(index.start), 'stop':int(index.stop), 'step':int(index.step)}
+
+    if isinstance(index, pd.MultiIndex):
+        levels = []
+        for i, (level, codes) in enumerate(zip(index.levels, index.codes)):
+            level_meta = _save_index(level, f'{path}_level{i}')
+            level_meta['codes'] = _save_array(codes, f'{path}_codes{i}')
+            levels.append(level_meta)
+        return {'type':'multi', 'names':list(index.names), 'levels':levels}
+
+    return {'type':'index', 'name':index.name, 'kind':_save_array(index.values, path)}
+
+def _load_index(meta, path, mmap_mode):
+    """
+    Rebuilds a pandas index from metadata written by _save_index
+    """
+    if meta['type'] == 'range':
+        return pd.RangeIndex(meta['start'], meta['stop'], meta['step'], name=meta['name'])
+
+    if meta['type'] == 'multi':
+        levels = []
+        codes = []
+        for i, level_meta in enumerate(meta['levels']):
+            levels.append(_load_index(level_meta, f'{path}_level{i}', mmap_mode))
+            codes.append(_load_array(f'{path}_codes{i}', level_meta['codes'], mmap_mode))
+        return pd.MultiIndex(levels=levels, codes=codes, names=meta['names'], verify_integrity=False)
+
+    return pd.Index(_load_array(path, meta['kind'], mmap_mode), name=meta['name'], copy=False)
+
+def _frame_blocks(df):
+    """
+    Returns list of (type, columns) groups of a frame: one 'array' group per numpy dtype holding
+    every column of that dtype, and one 'category' group per categorical column
+    """
+    groups = []
+    by_dtype = {}
+    for col in df.columns:
+        dtype = df[col].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            groups.append(('category', [col]))
+        elif isinstance(dtype, np.dtype):
+            if dtype.str not in by_dtype:
+                by_dtype[dtype.str] = []
+                groups.append(('array', by_dtype[dtype.str]))
+            by_dtype[dtype.str].append(col)
+        else:
+            groups.append(('array', [col]))
+    return groups
+
+def save_frame(df, name, store_dir=STORE_DIR):
+    """
+    Writes a DataFrame to the columnar store as memory mappable .npy files. Each save writes a
+    new version of the artifact and swaps it in atomically (see publish_version)
+
+    Frames whose columns all share one numeric dtype (ex. system_forcast) are written as a single
+    2-D block. Other frames are written one 2-D block per dtype with categoricals stored as
+    codes + categories, so pandas never has to consolidate (copy) the loaded blocks and every
+    column stays backed by the memory map
+
+    ---Params---
+
+    df: pandas DataFrame
+
+    name: str, artifact name, ex. 'historical'
+
+    store_dir: str, root directory of the store
+    """
+    path = new_version(os.path.join(store_dir, name))
+
+    meta = {'index':_save_index(df.index, os.path.join(path, '_index')),
+            'columns':[str(col) for col in df.columns]}
+
+    dtypes = set(df.dtypes)
+    if len(df.columns) and len(dtypes) == 1 and dtypes.pop().kind in 'biuf':
+        meta['layout'] = 'block'
+        np.save(os.path.join(path, '_block.npy'), np.ascontiguousarray(df.values))
+    else:
+        meta['layout'] = 'blocks'
+        meta['blocks'] = []
+        for i, (block_type, cols) in enumerate(_frame_blocks(df)):
+            block_path = os.path.join(path, f'block{i}')
+            block = {'type':block_type, 'columns':[str(col) for col in cols]}
+            if block_type == 'category':
+                cat = df[cols[0]].cat
+                block['codes'] = _save_array(cat.codes.values, block_path)
+                block['categories'] = _save_array(cat.categories.values, block_path + '_categories')
+            else:
+                #stored column major, row j of the block is column j of the group
+                block['kind'] = _save_array(np.stack([df[col].values for col in cols]), block_path)
+            meta['blocks'].append(block)
+        #artifacts load with their columns grouped by dtype
+        meta['columns'] = [col for block in meta['blocks'] for col in block['columns']]
+
+    with open(os.path.join(path, 'meta.json'),'w') as f:
+        json.dump(meta, f)
+    publish_version(path, os.path.join(store_dir, name))
+
+class FrameStore(object):
+    """
+    Read only, memory mapped view of an artifact written by save_frame.
+    Columns are loaded lazily and share the OS page cache between processes
+    """
+
+    def __init__(self, name, store_dir=STORE_DIR, mmap_mode='c'):
+        self.name = name
+        #pin the current version so a concurrent save_frame cannot change files under this view
+        self.path = os.path.realpath(os.path.join(store_dir, name))
+        self.mmap_mode = mmap_mode
+        with open(os.path.join(self.path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.columns = self.meta['columns']
+        self._index = None
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = _load_index(self.meta['index'], os.path.join(self.path, '_index'), self.mmap_mode)
+        return self._index
+
+    def _block(self, i):
+        block = self.meta['blocks'][i]
+        block_path = os.path.join(self.path, f'block{i}')
+        if block['type'] == 'category':
+            codes = _load_array(block_path, block['codes'], self.mmap_mode)
+            categories = _load_array(block_path + '_categories', block['categories'], self.mmap_mode)
+            return pd.Categorical.from_codes(codes, categories=categories)
+        return _load_array(block_path, block['kind'], self.mmap_mode)
+
+    def _locate(self, col):
+        """
+        Returns (block number, row in block) of a column
+        """
+        for i, block in enumerate(self.meta['blocks']):
+            if col in block['columns']:
+                return i, block['columns'].index(col)
+        raise KeyError(col)
+
+    def values(self, col):
+        """
+        Returns the memory mapped values of one column
+        """
+        if self.meta['layout'] == 'block':
+            block = np.load(os.path.join(self.path, '_block.npy'), mmap_mode=self.mmap_mode)
+            return block[:, self.columns.index(col)]
+
+        i, j = self._locate(col)
+        block = self._block(i)
+        return block if self.meta['blocks'][i]['type'] == 'category' else block[j]
+
+    def column(self, col):
+        """
+        Returns one column as a pandas Series without copying its values
+        """
+        return pd.Series(self.values(col), index=self.index, name=col, copy=False)
+
+    def frame(self, columns=None):
+        """
+        Returns the artifact as a DataFrame whose columns are views of the memory map.
+        Columns come back in store order (grouped by dtype) and only the requested ones are read
+
+        ---Params---
+
+        columns: list of str, subset of columns to load, if None loads all
+        """
+        if self.meta['layout'] == 'block':
+            block = np.load(os.path.join(self.path, '_block.npy'), mmap_mode=self.mmap_mode)
+            df = pd.DataFrame(block, index=self.index, columns=self.columns, copy=False)
+            return df if columns is None else df[columns]
+
+        wanted = set(self.columns if columns is None else columns)
+        missing = wanted.difference(self.columns)
+        if missing:
+            raise KeyError(sorted(missing))
+
+        frames = []
+        for i, block in enumerate(self.meta['blocks']):
+            cols = [col for col in block['columns'] if col in wanted]
+            if not cols:
+                continue
+            values = self._block(i)
+            if block['type'] == 'category':
+                frames.append(pd.DataFrame({cols[0]:values}, index=self.index, copy=False))
+            elif len(cols) == len(block['columns']):
+                #one frame per dtype block, so the frame is already consolidated and never copied
+                frames.append(pd.DataFrame(values.T, index=self.index, columns=cols, copy=False))
+            else:
+                for col in cols:
+                    j = block['columns'].index(col)
+                    frames.append(pd.DataFrame(values[j:j + 1].T, index=self.index, columns=[col], copy=False))
+
+        if not frames:
+            return pd.DataFrame(index=self.index)
+        return pd.concat(frames, axis=1, copy=False) if len(frames) > 1 else frames[0]
+
+def open_frame(name, store_dir=STORE_DIR, mmap_mode='c'):
+    """
+    Returns a FrameStore for the artifact
+    """
+    return FrameStore(name, store_dir, mmap_mode)
+
+def has_frame(name, store_dir=STORE_DIR):
+    """
+    Returns True if the artifact has been written to the store
+    """
+    return os.path.exists(os.path.join(store_dir, name, 'meta.json'))
+
+def load_frame(name, columns=None, store_dir=STORE_DIR):
+    """
+    Loads an artifact from the columnar store, falling back to its legacy pickle if the
+    store has not been built yet
+
+    ---Params---
+
+    name: str, artifact name, one of PICKLES keys or any name written with save_frame
+
+    columns: list of str, subset of columns to load, if None loads all
+    """
+    if has_frame(name, store_dir):
+        return open_frame(name, store_dir).frame(columns)
+
+    df = pickle.load(open(PICKLES[name],'rb'))
+    return df if columns is None else df[columns]
+
+def convert_pickles(names=None, store_dir=STORE_DIR):
+    """
+    Converts existing pickle artifacts to the columnar store
+
+    ---Params---
+
+    names: list of str, artifacts to convert, if None converts every legacy pickle that exists
+    """
+    names = list(PICKLES) if names is None else names
+    for name in names:
+        if os.path.exists(PICKLES[name]):
+            save_frame(pickle.load(open(PICKLES[name],'rb')), name, store_dir)
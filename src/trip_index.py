@@ -0,0 +1,217 @@
+import pandas as pd
+import numpy as np
+import os
+from src.store import new_version, publish_version
+
+#directory the event index arrays are written to
+TRIP_INDEX_DIR = 'data/store/trip_index'
+
+#trip columns the index is built from
+TRIP_INDEX_COLUMNS = ['start_station_id','starttime','end_station_id','stoptime']
+
+def _csr(station_ids, times, stations):
+    """
+    Sorts events by station then time and returns (offsets, times) where the events of
+    stations[i] are times[offsets[i]:offsets[i+1]]
+    """
+    pos = np.searchsorted(stations, station_ids)
+    order = np.lexsort((times, pos))
+    counts = np.bincount(pos, minlength=len(stations))
+    offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+    return offsets, times[order]
+
+class TripIndex(object):
+    """
+    Compact per-station index of trip departures and arrivals
+
+    Each station's departure and arrival times are kept as sorted int64 nanosecond
+    timestamps in two flat arrays with CSR style offsets, so window counts are binary
+    searches and net flow at any fixed resolution is a pair of bincounts
+    """
+
+    def __init__(self, stations, dep_offsets, dep_times, arr_offsets, arr_times):
+        self.stations = stations
+        self.dep_offsets = dep_offsets
+        self.dep_times = dep_times
+        self.arr_offsets = arr_offsets
+        self.arr_times = arr_times
+
+    @classmethod
+    def from_trips(cls, trips):
+        """
+        Builds index from a clean trips DataFrame (see cleaning.clean_trips)
+        """
+        return cls.from_chunks([trips])
+
+    @classmethod
+    def from_chunks(cls, chunks):
+        """
+        Builds index from an iterable of clean trip chunks (ex. cleaning.read_trip_store),
+        keeping only the station ids and times of each chunk
+        """
+        columns = {col:[] for col in TRIP_INDEX_COLUMNS}
+        for chunk in chunks:
+            for col in TRIP_INDEX_COLUMNS:
+                values = chunk[col].values
+                if col.endswith('time'):
+                    values = values.astype('datetime64[ns]').view(np.int64)
+                columns[col].append(values)
+        start_ids, starttime, end_ids, stoptime = [np.concatenate(columns[col]) for col in TRIP_INDEX_COLUMNS]
+
+        start_ids = start_ids.astype(np.int64)
+        end_ids = end_ids.astype(np.int64)
+        stations = np.union1d(start_ids, end_ids)
+
+        dep_offsets, dep_times = _csr(start_ids, starttime, stations)
+        arr_offsets, arr_times = _csr(end_ids, stoptime, stations)
+
+        return cls(stations, dep_offsets, dep_times, arr_offsets, arr_times)
+
+    def save(self, path=TRIP_INDEX_DIR):
+        """
+        Writes index arrays as .npy files for memory mapped loading, as a new version that is
+        swapped in atomically (see store.publish_version)
+        """
+        version = new_version(path)
+        for name in ['stations','dep_offsets','dep_times','arr_offsets','arr_times']:
+            np.save(os.path.join(version, name + '.npy'), getattr(self, name))
+        publish_version(version, path)
+
+    @classmethod
+    def load(cls, path=TRIP_INDEX_DIR, mmap_mode='r'):
+        """
+        Loads index arrays written by save, memory mapped by default
+        """
+        path = os.path.realpath(path)
+        arrays = [np.load(os.path.join(path, name + '.npy'), mmap_mode=mmap_mode)
+                  for name in ['stations','dep_offsets','dep_times','arr_offsets','arr_times']]
+        return cls(*arrays)
+
+    def __contains__(self, station_id):
+        i = np.searchsorted(self.stations, int(station_id))
+        return i < len(self.stations) and self.stations[i] == int(station_id)
+
+    def _events(self, station_id, kind):
+        """
+        Returns sorted int64 times of a station's departures or arrivals
+        """
+        if station_id not in self:
+            return np.empty(0, dtype=np.int64)
+        i = np.searchsorted(self.stations, int(station_id))
+        if kind == 'departures':
+            return self.dep_times[self.dep_offsets[i]:self.dep_offsets[i+1]]
+        elif kind == 'arrivals':
+            return self.arr_times[self.arr_offsets[i]:self.arr_offsets[i+1]]
+        raise ValueError("kind must be 'departures' or 'arrivals'")
+
+    def count(self, station_id, start, end, kind='departures'):
+        """
+        Returns number of departures or arrivals at a station in [start, end)
+
+        ---Params---
+
+        station_id: int
+
+        start, end: str or datetime-like, window bounds
+
+        kind: str, 'departures' or 'arrivals'
+        """
+        times = self._events(station_id, kind)
+        lo, hi = np.searchsorted(times, [pd.Timestamp(start).value, pd.Timestamp(end).value])
+        return int(hi - lo)
+
+    def window_counts(self, start, end, kind='departures'):
+        """
+        Returns pandas Series of departures or arrivals in [start, end) for every station
+        """
+        if kind == 'departures':
+            times, offsets = self.dep_times, self.dep_offsets
+        elif kind == 'arrivals':
+            times, offsets = self.arr_times, self.arr_offsets
+        else:
+            raise ValueError("kind must be 'departures' or 'arrivals'")
+
+        in_window = (times >= pd.Timestamp(start).value) & (times < pd.Timestamp(end).value)
+        cum = np.concatenate([[0], np.cumsum(in_window)])
+        return pd.Series(cum[offsets[1:]] - cum[offsets[:-1]], index=pd.Index(self.stations, name='station_id'))
+
+    def net_flow(self, station_id, resample='H', time_interval=None):
+        """
+        Returns a pandas Time Series of net bikes in/out of a station per resample time period
+        Positive value indicates net gain of bikes over resample time period
+
+        ---Params---
+
+        resample: str, fixed pandas frequency string (ex. '15min', 'H', 'D')
+
+        time_interval: ('YYYY-MM-DD HH:MM','YYYY-MM-DD HH:MM'), tuple of 2 strings, if None defaults
+                        to the station's first through last trip
+
+        Bins fall where resampling the station's whole series puts them, even for rules that do
+        not divide a day (ex. '7min')
+        """
+        step = pd.tseries.frequencies.to_offset(resample).nanos
+        deps = self._events(station_id, 'departures')
+        arrs = self._events(station_id, 'arrivals')
+        if len(deps) + len(arrs) == 0 and time_interval is None:
+            return pd.Series([], dtype=np.int64, index=pd.DatetimeIndex([]), name='net_bikes')
+
+        #bins are anchored to midnight of the station's first trip, as resample's origin='start_day'
+        first = min(deps[:1].tolist() + arrs[:1].tolist() or [pd.Timestamp(time_interval[0]).value])
+        origin = pd.Timestamp(first).floor('D').value
+
+        if time_interval is None:
+            last = max(deps[-1:].tolist() + arrs[-1:].tolist())
+            start = origin + (first - origin) // step * step
+            n_bins = int((last - start) // step) + 1
+        else:
+            start = origin + (pd.Timestamp(time_interval[0]).value - origin) // step * step
+            end = pd.Timestamp(time_interval[1]).value
+            n_bins = max(int((end - start) // step) + 1, 0)
+            end_value = start + n_bins * step
+            deps = deps[np.searchsorted(deps, start):np.searchsorted(deps, end_value)]
+            arrs = arrs[np.searchsorted(arrs, start):np.searchsorted(arrs, end_value)]
+
+        net = np.bincount((arrs - start) // step, minlength=n_bins) \
+            - np.bincount((deps - start) // step, minlength=n_bins)
+
+        index = pd.date_range(pd.Timestamp(start), periods=n_bins, freq=resample)
+        return pd.Series(net[:n_bins], index=index, name='net_bikes')
+
+    def net_counts(self, resample='H', station_ids=None, start=None, end=None):
+        """
+        Returns time x station DataFrame of net bikes in/out per resample time period for any
+        pandas frequency, including calendar ones (ex. 'M') that net_flow cannot bin
+
+        ---Params---
+
+        resample: str, pandas date offset string
+
+        station_ids: list of station ids to include, if None all stations in the index
+
+        start, end: datetime-like, optional bounds of the events counted
+        """
+        rows = np.arange(len(self.stations)) if station_ids is None else \
+            np.flatnonzero(np.isin(self.stations, np.asarray(station_ids, dtype=np.int64)))
+
+        events = []
+        for kind, sign in [('arrivals', 1), ('departures', -1)]:
+            offsets = self.arr_offsets if kind == 'arrivals' else self.dep_offsets
+            times = self.arr_times if kind == 'arrivals' else self.dep_times
+            slices = [slice(offsets[i], offsets[i+1]) for i in rows]
+            station = np.repeat(self.stations[rows], [s.stop - s.start for s in slices])
+            values = np.concatenate([times[s] for s in slices]) if slices else np.empty(0, dtype=np.int64)
+            keep = np.ones(len(values), dtype=bool)
+            if start is not None:
+                keep &= values >= pd.Timestamp(start).value
+            if end is not None:
+                keep &= values <= pd.Timestamp(end).value
+            events.append(pd.DataFrame({'station_id':station[keep], 'net':sign},
+                                       index=pd.DatetimeIndex(values[keep])))
+
+        events = pd.concat(events)
+        net = events.groupby([pd.Grouper(freq=resample), 'station_id']).net.sum().unstack(fill_value=0)
+        if len(net):
+            net = net.reindex(pd.date_range(net.index.min(), net.index.max(), freq=resample), fill_value=0)
+        net.columns.name = 'station_id'
+        return net
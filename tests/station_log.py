@@ -0,0 +1,81 @@
+"""
+Synthetic bikeshare_nyc_raw station logs and the original row-wise historical_initalize,
+shared by the regression test and benchmarks/historical_parse.py
+"""
+import numpy as np
+import pandas as pd
+
+def write_station_log(path, n_rows, month='2018-06', n_stations=20, seed=0):
+    """
+    Writes a tab delimited station log in the bikeshare_nyc_raw format: yy-mm-dd dates
+    and a 12 hour clock split into hour, minute and pm columns
+    """
+    rng = np.random.RandomState(seed)
+    start = pd.Timestamp(f'{month}-01')
+    times = start + pd.to_timedelta(rng.randint(0, 28 * 24 * 60, n_rows), unit='min')
+    tot_docks = rng.randint(15, 60, n_stations)
+    station = rng.randint(0, n_stations, n_rows)
+    avail_bikes = rng.randint(0, tot_docks[station] + 1)
+
+    pd.DataFrame({'dock_id':station + 72,
+                  'dock_name':np.array([f'Station {i}' for i in range(n_stations)])[station],
+                  'date':times.strftime('%y-%m-%d'),
+                  'hour':(times.hour + 11) % 12 + 1,
+                  'minute':times.minute,
+                  'pm':(times.hour >= 12).astype(int),
+                  'avail_bikes':avail_bikes,
+                  'avail_docks':tot_docks[station] - avail_bikes,
+                  'tot_docks':tot_docks[station],
+                  '_lat':40.7 + station / 1000,
+                  '_long':-74.0 + station / 1000,
+                  'in_service':1,
+                  'status_key':1}).to_csv(path, sep='\t', index=False)
+    return str(path)
+
+def legacy_historical_initalize(filepaths):
+    """
+    historical_initalize before it was vectorized, kept as the reference implementation
+    """
+    station_dfs = [pd.read_csv(path,delimiter='\t', dtype= {'minute':str,'hour':str,'date':str}) for path in filepaths ]
+
+    ts_stations = pd.concat(station_dfs)
+
+    # rename columns
+    ts_stations.rename(columns={'dock_id':'station_id','dock_name':'station_name'},inplace=True)
+
+    #assign am/pm
+    ts_stations.pm = np.where(ts_stations.pm == 1, 'PM','AM')
+
+    #convert to datetime objects
+    ts_stations.minute = ts_stations.minute.map(lambda x:x.zfill(2))
+    ts_stations.hour = ts_stations.hour.map(lambda x:x.zfill(2))
+    ts_stations['date_time'] = ts_stations.apply(lambda x: x['date'] + " " + str(x['hour']) + ":" + str(x['minute']) + x['pm'],
+                                                    axis=1)
+    ts_stations.date_time = pd.to_datetime(ts_stations.date_time, format='%y-%m-%d %I:%M%p')
+
+    #add percent_full
+    ts_stations['percent_full'] = ts_stations.avail_bikes/ts_stations.tot_docks
+
+    #add seasons
+    ts_stations['month'] = ts_stations.date_time.map(lambda x:x.month)
+
+    def season(x):
+        if x >=3 and x <=5:
+            return 'spring'
+        elif x >=6 and x <=8:
+            return 'summer'
+        elif x >=9 and x <=11:
+            return 'fall'
+        else:
+            return 'winter'
+
+    ts_stations['season'] = ts_stations.month.map(lambda x:season(x))
+
+    #multihierarchical index times series
+    ts_stations.set_index(['station_id','date_time'],inplace=True)
+    ts_stations.sort_values(['station_id','date_time'],inplace=True)
+
+    #drop uneeded cols
+    ts_stations.drop(columns=['month','pm','hour','minute','date'],inplace=True)
+
+    return ts_stations
@@ -0,0 +1,54 @@
+import pandas as pd
+import pytest
+from src.archive import ArchiveWriter, read_archive, TIMEZONE
+
+def snapshot(time, bikes):
+    """
+    Live frame of stations {station_id: bikes available} reported at a local time
+    """
+    reported = int(pd.Timestamp(time, tz=TIMEZONE).timestamp())
+    return pd.DataFrame({'station_id':list(bikes), 'station_name':[f'Station {i}' for i in bikes],
+                         'lat':40.7, 'lon':-74.0, 'capacity':20,
+                         'num_bikes_available':list(bikes.values()),
+                         'num_docks_available':[20 - n for n in bikes.values()],
+                         'num_bikes_disabled':0, 'num_docks_disabled':0, 'last_reported':reported})
+
+def write(writer, polls):
+    for time, bikes in polls:
+        writer.append(snapshot(time, bikes))
+    writer.flush()
+
+@pytest.fixture
+def archive_dir(tmp_path):
+    #station 1 sits at 5 bikes all day, station 2 changes every poll
+    polls = [(time, {1:5, 2:i % 7}) for i, time in enumerate(pd.date_range('2018-06-17 12:00', '2018-06-17 14:00', freq='10min'))]
+    write(ArchiveWriter(str(tmp_path)), polls)
+    return str(tmp_path)
+
+def test_unchanged_station_is_carried_into_window(archive_dir):
+    df = read_archive('2018-06-17 13:00', '2018-06-17 14:00', archive_dir, resample='30min')
+    assert sorted(df.index.get_level_values('station_id').unique()) == [1, 2]
+    assert list(df.loc[1].avail_bikes) == [5, 5, 5]
+    assert list(df.loc[1].index) == list(pd.date_range('2018-06-17 13:00', '2018-06-17 14:00', freq='30min'))
+    #last report in each bin
+    assert list(df.loc[2].avail_bikes) == [1, 4, 5]
+
+def test_change_rows_start_with_status_at_start(archive_dir):
+    df = read_archive('2018-06-17 13:05', '2018-06-17 13:30', archive_dir)
+    assert list(df.loc[1].avail_bikes) == [5]
+    assert df.loc[1].index[0] == pd.Timestamp('2018-06-17 13:05')
+    assert list(df.loc[2].avail_bikes) == [6, 0, 1, 2]
+
+def test_status_found_in_earlier_partition(tmp_path):
+    writer = ArchiveWriter(str(tmp_path))
+    write(writer, [('2018-06-17 23:00', {1:5, 2:3}), ('2018-06-17 23:30', {1:5, 2:4})])
+
+    #archive written without opening snapshots, only station 2 has rows on the 18th
+    writer.partition = '2018-06-18'
+    writer.stations = None
+    write(writer, [('2018-06-18 09:00', {1:5, 2:6})])
+
+    df = read_archive('2018-06-18 08:00', '2018-06-18 10:00', str(tmp_path), resample='60min')
+    assert list(df.loc[1].avail_bikes) == [5, 5, 5]
+    assert list(df.loc[2].avail_bikes) == [4, 6, 6]
+    assert df.loc[1].station_name.iloc[0] == 'Station 1'
@@ -0,0 +1,107 @@
+import os
+import pickle
+import numpy as np
+import pandas as pd
+import pytest
+import src.cleaning as cleaning
+from src.trip_index import TripIndex
+from src.cleaning import trip_stream_initialize, read_trip_store, trip_stream_index, pickle_data, month_cache_path, \
+    apply_schema, default_memory_usage, TRIP_SCHEMA
+
+def write_trips(path, n, month='2018-06'):
+    start = pd.Timestamp(f'{month}-01') + pd.to_timedelta(np.arange(n) * 7, unit='min')
+    stop = start + pd.Timedelta(minutes=12)
+    pd.DataFrame({'tripduration':np.full(n, 720),
+                  'starttime':start.strftime('%Y-%m-%d %H:%M:%S.%f'),
+                  'stoptime':stop.strftime('%Y-%m-%d %H:%M:%S.%f'),
+                  'start station id':np.arange(n) % 5 + 72,
+                  'start station name':'W 52 St & 11 Ave',
+                  'start station latitude':40.767,
+                  'start station longitude':-73.993,
+                  'end station id':np.arange(n) % 3 + 79,
+                  'end station name':'Franklin St & W Broadway',
+                  'end station latitude':40.719,
+                  'end station longitude':-74.006,
+                  'bikeid':np.arange(n) + 14000,
+                  'usertype':'Subscriber',
+                  'birth year':1985,
+                  'gender':1}).to_csv(path, index=False)
+    return str(path)
+
+def stored_rows(store_dir):
+    return sum(len(chunk) for chunk in read_trip_store(store_dir))
+
+def test_rerun_replaces_chunks(tmp_path):
+    june = write_trips(tmp_path / '201806-citibike-tripdata.csv', 400)
+    july = write_trips(tmp_path / '201807-citibike-tripdata.csv', 400, month='2018-07')
+    store_dir = str(tmp_path / 'trips')
+
+    trip_stream_initialize([june, july], store_dir, chunksize=50)
+    assert stored_rows(store_dir) == 800
+
+    #fewer, larger chunks must not leave the old <month>_NNNN chunks behind
+    trip_stream_initialize([june, july], store_dir, chunksize=300)
+    assert stored_rows(store_dir) == 800
+    assert len([name for name in (tmp_path / 'trips').iterdir() if name.suffix == '.pickle']) == 4
+
+    #months left out of a rerun are no longer read
+    trip_stream_initialize([june], store_dir, chunksize=300)
+    assert stored_rows(store_dir) == 400
+
+def test_chunks_match_whole_read(tmp_path):
+    june = write_trips(tmp_path / '201806-citibike-tripdata.csv', 230)
+    paths = trip_stream_initialize([june], str(tmp_path / 'trips'), chunksize=100)
+    assert len(paths) == 3
+    trips = pd.concat(read_trip_store(str(tmp_path / 'trips')))
+    assert trips.starttime.is_monotonic_increasing
+    assert len(trips) == 230
+
+@pytest.fixture
+def build_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('data/pickle')
+    os.makedirs('data/trip_data')
+    paths = [write_trips(f'data/trip_data/2018{month:02d}-citibike-tripdata.csv', 100, month=f'2018-{month:02d}')
+             for month in [6, 7]]
+    monkeypatch.setattr(cleaning, 'TRIP_FILEPATHS', paths)
+    monkeypatch.setattr(cleaning, 'HISTORICAL_FILEPATHS', [])
+    return paths
+
+def pickled_trips():
+    return pickle.load(open('data/pickle/trips.pickle','rb'))
+
+def test_pickle_data_follows_manifest(build_dir):
+    june, july = build_dir
+    report = pickle_data(refresh_live=False)
+    assert len(pickled_trips()) == 200
+    assert list(report.index) == ['trips']
+    assert report.loc['trips', 'after_mb'] < report.loc['trips', 'before_mb']
+
+    #months whose source file was removed are dropped along with their cache
+    os.remove(july)
+    pickle_data(incremental=True, refresh_live=False)
+    assert len(pickled_trips()) == 100
+    assert not os.path.exists(month_cache_path(july))
+
+def test_missing_month_cache_raises(build_dir):
+    june, july = build_dir
+    pickle_data(refresh_live=False)
+    os.remove(month_cache_path(june))
+    write_trips(july, 50, month='2018-07')
+    with pytest.raises(FileNotFoundError):
+        pickle_data(incremental=True, refresh_live=False)
+
+def test_default_memory_usage(tmp_path):
+    trips = pd.read_csv(write_trips(tmp_path / '201806-citibike-tripdata.csv', 300))
+    trips.columns = [col.replace(' ','_') for col in trips.columns]
+    compact = apply_schema(trips.copy(), TRIP_SCHEMA)
+    assert compact.start_station_name.dtype == 'category'
+    assert default_memory_usage(compact, TRIP_SCHEMA) == trips.memory_usage(deep=True).sum()
+
+def test_trip_index_from_store(build_dir):
+    trip_stream_initialize(build_dir, 'data/pickle/trips', chunksize=30)
+    index = trip_stream_index('data/pickle/trips')
+    expected = TripIndex.from_trips(pd.concat(read_trip_store('data/pickle/trips')))
+    for name in ['stations','dep_offsets','dep_times','arr_offsets','arr_times']:
+        np.testing.assert_array_equal(getattr(index, name), getattr(expected, name))
+    assert os.path.exists('data/store/flow_cube/meta.json')
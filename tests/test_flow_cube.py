@@ -0,0 +1,21 @@
+import numpy as np
+import pandas as pd
+from src.flow_cube import FlowCube
+from src.trip_index import TripIndex
+
+def test_net_covers_station_span():
+    starttime = pd.to_datetime(['2018-06-01 08:10', '2018-06-12 09:20', '2018-06-14 17:05', '2018-06-30 23:50'])
+    trips = pd.DataFrame({'start_station_id':[72, 79, 82, 72], 'end_station_id':[72, 82, 79, 72],
+                          'starttime':starttime, 'stoptime':starttime + pd.Timedelta('5min')})
+    trip_index = TripIndex.from_trips(trips)
+    cube = FlowCube.from_trip_index(trip_index)
+
+    for station_id in [72, 79, 82]:
+        ts = cube.net(station_id, '60min')
+        pd.testing.assert_series_equal(ts, trip_index.net_flow(station_id, '60min'),
+                                       check_dtype=False, check_freq=False)
+
+    ts = cube.net(79, '60min')
+    assert ts.index[0] == pd.Timestamp('2018-06-12 09:00')
+    assert ts.index[-1] == pd.Timestamp('2018-06-14 17:00')
+    assert len(ts) == 57
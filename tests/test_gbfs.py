@@ -0,0 +1,138 @@
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import requests
+import src.gbfs as gbfs
+from src.gbfs import make_session, fetch_json, fetch_feeds, cached_json
+
+class FeedHandler(BaseHTTPRequestHandler):
+    """
+    Serves fixture json from server.routes: path -> list of (status, body, delay) responses,
+    the last one repeating once the others are used up
+    """
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.hits[self.path] = self.server.hits.get(self.path, 0) + 1
+            responses = self.server.routes[self.path]
+            status, body, delay = responses.pop(0) if len(responses) > 1 else responses[0]
+        time.sleep(delay)
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def gbfs_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FeedHandler)
+    server.daemon_threads = True
+    server.routes = {}
+    server.hits = {}
+    server.lock = threading.Lock()
+    server.url = f'http://127.0.0.1:{server.server_address[1]}'
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def feed(ttl=10, **data):
+    return {'last_updated':int(time.time()), 'ttl':ttl, 'data':data}
+
+def test_fetch_feeds_concurrent(gbfs_server):
+    names = ['station_information','station_status','system_regions','bike_angels']
+    for name in names:
+        gbfs_server.routes[f'/{name}.json'] = [(200, feed(name=name), 0.4)]
+    feed_dict = {name:f'{gbfs_server.url}/{name}.json' for name in names}
+
+    started = time.perf_counter()
+    feeds = fetch_feeds(feed_dict, names, session=make_session())
+    elapsed = time.perf_counter() - started
+
+    assert {name:feeds[name]['data']['name'] for name in names} == {name:name for name in names}
+    #four 0.4s responses fetched one after another would take 1.6s
+    assert elapsed < 1.0
+
+def test_fetch_timeout(gbfs_server):
+    gbfs_server.routes['/station_status.json'] = [(200, feed(), 2)]
+    started = time.perf_counter()
+    #read timeouts surface as ConnectionError once urllib3 has used up its retries
+    with pytest.raises(requests.RequestException):
+        fetch_json(f'{gbfs_server.url}/station_status.json', timeout=(1, 0.2), session=make_session(retries=0))
+    assert time.perf_counter() - started < 1.5
+
+    #timed out reads are retried like 5xx responses
+    with pytest.raises(requests.RequestException):
+        fetch_json(f'{gbfs_server.url}/station_status.json', timeout=(1, 0.2), session=make_session(retries=1, backoff=0))
+    assert gbfs_server.hits['/station_status.json'] == 3
+
+def test_fetch_retries_5xx(gbfs_server):
+    gbfs_server.routes['/station_status.json'] = [(503, {}, 0), (502, {}, 0), (200, feed(stations=[]), 0)]
+    data = fetch_json(f'{gbfs_server.url}/station_status.json', session=make_session(retries=3, backoff=0))
+    assert data['data'] == {'stations':[]}
+    assert gbfs_server.hits['/station_status.json'] == 3
+
+def test_fetch_gives_up_after_retries(gbfs_server):
+    gbfs_server.routes['/station_status.json'] = [(500, {}, 0)]
+    with pytest.raises(requests.RequestException):
+        fetch_json(f'{gbfs_server.url}/station_status.json', session=make_session(retries=2, backoff=0))
+    assert gbfs_server.hits['/station_status.json'] == 3
+
+def test_cached_json_honors_ttl(gbfs_server, tmp_path):
+    url = f'{gbfs_server.url}/system_regions.json'
+    gbfs_server.routes['/system_regions.json'] = [(200, feed(ttl=60, regions=[{'region_id':'71', 'name':'NYC District'}]), 0)]
+
+    first = cached_json('system_regions', url, str(tmp_path), session=make_session())
+    second = cached_json('system_regions', url, str(tmp_path), session=make_session())
+    assert first == second
+    assert gbfs_server.hits['/system_regions.json'] == 1
+    assert os.path.exists(tmp_path / 'system_regions.json')
+
+def test_cached_json_refetches_expired(gbfs_server, tmp_path):
+    url = f'{gbfs_server.url}/station_status.json'
+    gbfs_server.routes['/station_status.json'] = [(200, feed(ttl=0, n=1), 0), (200, feed(ttl=0, n=2), 0)]
+
+    assert cached_json('station_status', url, str(tmp_path), session=make_session())['data'] == {'n':1}
+    assert cached_json('station_status', url, str(tmp_path), session=make_session())['data'] == {'n':2}
+    assert gbfs_server.hits['/station_status.json'] == 2
+
+def test_cached_json_offline_fallback(gbfs_server, tmp_path):
+    url = f'{gbfs_server.url}/station_status.json'
+    gbfs_server.routes['/station_status.json'] = [(200, feed(ttl=0, stations=[]), 0), (503, {}, 0)]
+    cached = cached_json('station_status', url, str(tmp_path))
+
+    #expired copy is served when the feed errors, without retrying, and reused until RETRY_AFTER
+    assert cached_json('station_status', url, str(tmp_path)) == cached
+    assert cached_json('station_status', url, str(tmp_path)) == cached
+    assert gbfs_server.hits['/station_status.json'] == 2
+
+    #and from disk when the server is gone
+    gbfs._memo.clear()
+    gbfs_server.shutdown()
+    gbfs_server.server_close()
+    started = time.perf_counter()
+    assert cached_json('station_status', url, str(tmp_path)) == cached
+    assert time.perf_counter() - started < 1
+
+def test_feed_dict_kept_in_process(gbfs_server, tmp_path, monkeypatch):
+    #discovery lists ttl 0 but is kept for its MIN_TTL floor
+    gbfs_server.routes['/gbfs.json'] = [(200, feed(ttl=0, en={'feeds':[{'name':'system_regions',
+                                                                        'url':f'{gbfs_server.url}/system_regions.json'}]}), 0)]
+    gbfs_server.routes['/system_regions.json'] = [(200, feed(ttl=0, regions=[{'region_id':'71', 'name':'NYC District'}]), 0)]
+    monkeypatch.setattr(gbfs, 'GBFS_URL', f'{gbfs_server.url}/gbfs.json')
+
+    for _ in range(5):
+        assert gbfs.get_regions(str(tmp_path)) == {'71':'NYC District'}
+    assert gbfs_server.hits == {'/gbfs.json':1, '/system_regions.json':1}
+
+def test_cached_json_offline_without_copy(tmp_path):
+    with pytest.raises(requests.RequestException):
+        cached_json('gbfs', 'http://127.0.0.1:9/gbfs.json', str(tmp_path), session=make_session(retries=0))
@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.harmonic import HarmonicForecaster, forecast_system
+
+@pytest.fixture
+def station_mat():
+    index = pd.date_range('2018-06-17', '2018-06-30 23:00', freq='60min', name='date_time')
+    rng = np.random.RandomState(0)
+    daily = 10 + 3 * np.sin(2 * np.pi * index.hour / 24)
+    columns = {72:np.ones(len(index), dtype=bool),
+               #reports missing at random
+               79:rng.rand(len(index)) > 0.3,
+               #only observed at 8 and 9 AM: enough observations, but the daily terms are collinear
+               82:np.isin(index.hour, [8, 9]),
+               #only three days observed, too few to separate the weekly terms
+               83:index < '2018-06-20',
+               #fewer observations than terms
+               116:index < '2018-06-17 10:00'}
+    return pd.DataFrame({station:np.where(mask, daily + rng.randn(len(index)), np.nan)
+                         for station, mask in columns.items()}, index=index)
+
+def test_ill_conditioned_stations_are_not_fitted(station_mat):
+    model = HarmonicForecaster().fit(station_mat)
+    fitted = ~np.isnan(model.coef[:, 0])
+    assert list(station_mat.columns[fitted]) == [72, 79]
+
+    yhat = model.predict(model.future_index(7 * 24, '60min'))['yhat']
+    assert yhat[[72, 79]].min().min() > 0
+    assert yhat[[82, 83, 116]].isna().all().all()
+
+def test_forecast_system_leaves_out_unfitted(station_mat):
+    system_forcast, system_daily = forecast_system(station_mat, periods=24, freq='60min')
+    assert list(system_forcast.columns) == ['yhat_72','yhat_79']
+    assert list(system_daily.columns) == ['daily_72','daily_79']
+    assert system_forcast.abs().max().max() < 20
@@ -0,0 +1,29 @@
+import pandas as pd
+import pytest
+import src.cleaning as cleaning
+from src.cleaning import historical_initalize, apply_schema, STATION_LOG_SCHEMA
+from tests.station_log import write_station_log, legacy_historical_initalize
+
+@pytest.fixture
+def station_logs(tmp_path):
+    return [write_station_log(tmp_path / f'bikeshare_nyc_raw_{name}2018.csv', 3000, month, seed=i)
+            for i, (name, month) in enumerate([('feb','2018-02'), ('jun','2018-06'), ('nov','2018-11')])]
+
+@pytest.mark.parametrize('n_jobs', [1, 2])
+def test_matches_row_wise_implementation(station_logs, monkeypatch, n_jobs):
+    monkeypatch.setattr(cleaning, 'HISTORICAL_FILEPATHS', station_logs)
+    expected = legacy_historical_initalize(station_logs)
+    #the row-wise version predates the compact schema, so compare on the same dtypes
+    expected = apply_schema(expected.reset_index(), STATION_LOG_SCHEMA).set_index(['station_id','date_time'])
+
+    pd.testing.assert_frame_equal(historical_initalize(n_jobs=n_jobs), expected)
+
+def test_twelve_hour_clock(tmp_path):
+    path = tmp_path / 'bikeshare_nyc_raw_jun2018.csv'
+    pd.DataFrame({'dock_id':[72, 72, 72, 72], 'dock_name':'W 52 St & 11 Ave', 'date':'18-06-17',
+                  'hour':[12, 1, 12, 11], 'minute':[5, 0, 30, 59], 'pm':[0, 0, 1, 1],
+                  'avail_bikes':10, 'avail_docks':29, 'tot_docks':39, '_lat':40.767, '_long':-73.993,
+                  'in_service':1, 'status_key':1}).to_csv(path, sep='\t', index=False)
+    df = cleaning.read_clean_station_log(str(path))
+    assert list(df.date_time.dt.strftime('%H:%M')) == ['00:05','01:00','12:30','23:59']
+    assert (df.season == 'summer').all()
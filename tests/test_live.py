@@ -0,0 +1,87 @@
+import time
+import pandas as pd
+import pytest
+import src.live as live
+from src.live import LiveSnapshot, EMPTY_SNAPSHOT
+
+@pytest.fixture
+def nothing_stored(monkeypatch):
+    monkeypatch.setattr(live, 'has_frame', lambda name: False)
+
+def test_snapshot_readers_do_not_hang_offline(nothing_stored):
+    def offline():
+        raise ConnectionError('feed unreachable')
+
+    snapshot = LiveSnapshot(loader=offline, wait_timeout=0.2, retry_interval=0.05).start()
+    started = time.perf_counter()
+    assert snapshot.registry.get(3172) is None
+    assert len(snapshot.frame) == 0
+    assert snapshot.current() is EMPTY_SNAPSHOT
+    #only the first read waits
+    assert time.perf_counter() - started < 0.4
+
+def test_snapshot_serves_first_fetch(nothing_stored):
+    frame = pd.DataFrame({'station_id':[3172], 'station_name':['W 74 St & Columbus Ave'], 'capacity':[31]})
+    frame.attrs['ttl'] = 10
+
+    snapshot = LiveSnapshot(loader=lambda: frame, wait_timeout=5).start()
+    assert snapshot.registry[3172]['capacity'] == 31
+    assert snapshot.frame is frame
+
+def information_feed(station_ids, last_updated=1):
+    return {'last_updated':last_updated, 'ttl':10, 'data':{'stations':[
+        {'station_id':str(i), 'name':f'Station {i}', 'lat':40.7, 'lon':-74.0, 'capacity':30,
+         'region_id':'71', 'legacy_id':str(i)} for i in station_ids]}}
+
+def status_feed(station_ids, reported, bikes):
+    return {'last_updated':reported, 'ttl':10, 'data':{'stations':[
+        {'station_id':str(i), 'num_bikes_available':bikes, 'num_docks_available':30 - bikes,
+         'last_reported':reported, 'station_status':'active', 'legacy_id':str(i)} for i in station_ids]}}
+
+def angels_feed(station_ids, action='give'):
+    return {'features':[{'properties':{'station_id':str(i), 'bike_angels_action':action,
+                                        'bike_angels_points':2, 'bike_angels_digits':1}} for i in station_ids]}
+
+@pytest.fixture
+def feeds(monkeypatch):
+    """
+    Feeds served to LiveStationTable.update, replaced by the test between updates
+    """
+    served = {}
+    monkeypatch.setattr(live, 'get_feed_dict', lambda: {'station_information':'', 'station_status':'', 'bike_angels':''})
+    monkeypatch.setattr(live, 'cached_json', lambda name, url, timeout: served['station_information'])
+    monkeypatch.setattr(live, 'fetch_feeds', lambda feed_dict, names, timeout: {name:served[name] for name in names})
+    return served
+
+def counted_rebuilds(table):
+    rebuilds = []
+    rebuild = table._rebuild
+    table._rebuild = lambda *args: (rebuilds.append(1), rebuild(*args))
+    return rebuilds
+
+def test_updates_are_differential_when_feeds_disagree(feeds):
+    table = live.LiveStationTable()
+    rebuilds = counted_rebuilds(table)
+
+    #station 82 reports status but has no information record and 79 no bike angels record
+    feeds['station_information'] = information_feed([72, 79])
+    feeds['bike_angels'] = angels_feed([72, 82])
+    for reported in range(1, 5):
+        feeds['station_status'] = status_feed([72, 79, 82], reported, bikes=reported)
+        live_df = table.update()
+
+    assert len(rebuilds) == 1
+    assert list(live_df.station_id) == [72, 79]
+    assert list(live_df.num_bikes_available) == [4, 4]
+    assert list(live_df.bike_angels_points) == [2, 0]
+
+    #angels changes are applied in place, including stations leaving the layer
+    feeds['bike_angels'] = angels_feed([79], action='take')
+    live_df = table.update()
+    assert len(rebuilds) == 1
+    assert list(live_df.bike_angels_points) == [0, -2]
+
+    #new station information is re-merged
+    feeds['station_information'] = information_feed([72, 79, 82], last_updated=2)
+    assert list(table.update().station_id) == [72, 79, 82]
+    assert len(rebuilds) == 2
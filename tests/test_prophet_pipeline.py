@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+prophet_pipeline = pytest.importorskip('src.prophet_pipeline')
+
+@pytest.fixture
+def fits(monkeypatch):
+    """
+    Replaces the Prophet fit with a constant forecast at the training mean, recording fitted stations
+    """
+    fitted = []
+
+    def fit_station(args):
+        station, ds, y, params, periods, freq = args
+        fitted.append(station)
+        future = pd.DatetimeIndex(ds).append(pd.date_range(ds[-1], periods=periods + 1, freq=freq)[1:])
+        return station, future.values, np.full(len(future), np.nanmean(y)), np.zeros(len(future))
+
+    monkeypatch.setattr(prophet_pipeline, 'fit_station', fit_station)
+    return fitted
+
+@pytest.fixture
+def station_mat():
+    index = pd.date_range('2018-06-17', '2018-06-30 23:00', freq='60min', name='date_time')
+    return pd.DataFrame({72:np.full(len(index), 10.0), 79:np.full(len(index), 20.0)}, index=index)
+
+def test_resume_and_refit_changed_training_data(fits, station_mat, tmp_path):
+    run = dict(periods=24, freq='60min', n_jobs=1, results_dir=str(tmp_path))
+    system_forcast, _ = prophet_pipeline.forecast_system(station_mat, **run)
+    assert fits == ['72','79']
+
+    #unchanged training data resumes from the checkpoints
+    prophet_pipeline.forecast_system(station_mat, **run)
+    assert fits == ['72','79']
+
+    #rebuilt data for station 79 is refit instead of resuming its stale forecast
+    station_mat[79] = 30.0
+    system_forcast, _ = prophet_pipeline.forecast_system(station_mat, **run)
+    assert fits == ['72','79','79']
+    assert system_forcast.yhat_79.iloc[-1] == 30.0
+    assert system_forcast.yhat_72.iloc[-1] == 10.0
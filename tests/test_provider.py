@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.provider import DataProvider, set_provider
+from src.station import Station
+
+@pytest.fixture
+def historical():
+    #station 72 reports every 7 minutes with a gap on the morning of June 2
+    times = pd.date_range('2018-06-01', '2018-06-04', freq='7min')
+    times = times[(times < '2018-06-02 04:00') | (times > '2018-06-02 06:10')].values.astype('datetime64[ns]')
+    index = pd.MultiIndex.from_arrays([np.full(len(times), 72), times], names=['station_id','date_time'])
+    return pd.DataFrame({'avail_bikes':np.arange(len(times)) % 30}, index=index)
+
+@pytest.fixture
+def station(historical):
+    set_provider(DataProvider(historical=historical))
+    station = Station.__new__(Station)
+    station.id = 72
+    yield station
+    set_provider(None)
+
+@pytest.mark.parametrize('resample', ['15min','60min','D'])
+@pytest.mark.parametrize('time_interval', [('2018-06-02 05:30','2018-06-02 09:00'), ('2018-06-01','2018-06-02 05:00'),
+                                           ('2018-05-31','2018-06-02'), ('2018-06-03 23:00','2018-06-05')])
+def test_avail_bikes_matches_resample_then_slice(station, historical, resample, time_interval):
+    expected = historical.loc[72].avail_bikes.resample(resample).mean()[time_interval[0]:time_interval[1]]
+    pd.testing.assert_series_equal(station.avail_bikes_ts(resample, time_interval), expected, check_freq=False)
+
+def test_memo_survives_unrelated_replacements(historical):
+    provider = DataProvider(historical=historical)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return len(calls)
+
+    for _ in range(3):
+        provider.memoize('avail', compute, ('historical',))
+    #a live refresh leaves historical results cached
+    provider.refresh_live(pd.DataFrame({'station_id':[72], 'station_name':['W 52 St & 11 Ave']}), save=False)
+    assert provider.memoize('avail', compute, ('historical',)) == 1
+
+    provider.inject(historical=historical.iloc[:10])
+    assert provider.memoize('avail', compute, ('historical',)) == 2
+    assert len(calls) == 2
+
+def test_replacing_trips_drops_derived_datasets():
+    provider = DataProvider()
+    #as if loaded from the stored trip index and flow cube
+    provider._data.update(trip_index='index', flow_cube='cube')
+    provider.inject(trips='trips')
+    assert provider.loaded() == ['trips']
@@ -0,0 +1,80 @@
+import mmap
+import numpy as np
+import pandas as pd
+import pytest
+from src.store import save_frame, open_frame, load_frame
+
+def memory_mapped(values):
+    """
+    Returns True if an array is a view of a memory map rather than a private copy
+    """
+    while values is not None:
+        if isinstance(values, (np.memmap, mmap.mmap)):
+            return True
+        values = getattr(values, 'base', None)
+    return False
+
+def column_values(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.array._codes
+    return series.values
+
+@pytest.fixture
+def station_log():
+    n = 1000
+    index = pd.MultiIndex.from_arrays([np.arange(n) % 7, np.arange(n)], names=['station_id','row'])
+    return pd.DataFrame({'avail_bikes':np.arange(n, dtype='int16'),
+                         'station_name':pd.Categorical(['W 52 St','E 17 St'] * (n // 2)),
+                         '_lat':np.linspace(40.6, 40.8, n).astype('float32'),
+                         'avail_docks':np.arange(n, dtype='int16')[::-1],
+                         '_long':np.linspace(-74.0, -73.9, n).astype('float32'),
+                         'date_time':pd.date_range('2018-06-01', periods=n, freq='15min').values.astype('datetime64[ns]'),
+                         'weekday':np.ones(n, dtype=bool)}, index=index)
+
+def test_round_trip(station_log, tmp_path):
+    save_frame(station_log, 'historical', store_dir=str(tmp_path))
+    df = load_frame('historical', store_dir=str(tmp_path))
+    assert sorted(df.columns) == sorted(station_log.columns)
+    pd.testing.assert_frame_equal(df, station_log[df.columns])
+
+def test_columns_backed_by_memmap(station_log, tmp_path):
+    save_frame(station_log, 'historical', store_dir=str(tmp_path))
+    df = load_frame('historical', store_dir=str(tmp_path))
+    for col in df.columns:
+        assert memory_mapped(column_values(df[col])), col
+
+    #operations that make pandas consolidate must not replace the mapped blocks with copies
+    df[df.avail_bikes > 10].groupby(level=0).mean(numeric_only=True)
+    for col in df.columns:
+        assert memory_mapped(column_values(df[col])), col
+
+def test_column_subset(station_log, tmp_path):
+    save_frame(station_log, 'historical', store_dir=str(tmp_path))
+    df = open_frame('historical', store_dir=str(tmp_path)).frame(['avail_docks','_lat'])
+    assert sorted(df.columns) == ['_lat','avail_docks']
+    assert all(memory_mapped(df[col].values) for col in df.columns)
+    np.testing.assert_array_equal(df.avail_docks.values, station_log.avail_docks.values)
+
+def test_block_layout(tmp_path):
+    forecast = pd.DataFrame(np.random.rand(48, 3), columns=['yhat_72','yhat_79','yhat_82'],
+                            index=pd.date_range('2018-06-17', periods=48, freq='h', name='date_time'))
+    save_frame(forecast, 'system_forcast', store_dir=str(tmp_path))
+    df = load_frame('system_forcast', store_dir=str(tmp_path))
+    pd.testing.assert_frame_equal(df, forecast, check_freq=False)
+    assert memory_mapped(df.values)
+
+def test_save_does_not_rewrite_mapped_files(tmp_path):
+    big = pd.DataFrame({'tripduration':np.arange(2_000_000, dtype='int32'),
+                        'starttime':np.arange(2_000_000, dtype='int64')})
+    save_frame(big, 'trips', store_dir=str(tmp_path))
+    df = load_frame('trips', store_dir=str(tmp_path))
+    store = open_frame('trips', store_dir=str(tmp_path))
+
+    save_frame(big.head(10), 'trips', store_dir=str(tmp_path))
+    assert df.tripduration.values[-1] == 1_999_999
+    assert len(store.values('starttime')) == 2_000_000
+    assert len(load_frame('trips', store_dir=str(tmp_path))) == 10
+
+    #only the current version and the one it replaced are kept
+    save_frame(big.head(5), 'trips', store_dir=str(tmp_path))
+    assert len(list((tmp_path / '.versions' / 'trips').iterdir())) == 2
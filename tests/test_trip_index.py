@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.trip_index import TripIndex
+
+@pytest.fixture
+def trips():
+    rng = np.random.RandomState(0)
+    n = 500
+    starttime = (np.datetime64('2018-06-01') + rng.randint(0, 7 * 24 * 3600, n).astype('timedelta64[s]')).astype('datetime64[ns]')
+    return pd.DataFrame({'start_station_id':rng.randint(72, 80, n), 'end_station_id':rng.randint(72, 80, n),
+                         'starttime':starttime, 'stoptime':starttime + np.timedelta64(15, 'm')})
+
+@pytest.mark.parametrize('unit', ['s','us','ns'])
+def test_from_trips_any_resolution(trips, unit):
+    #trip times keep whatever resolution they were parsed with
+    coarse = trips.assign(starttime=trips.starttime.values.astype(f'datetime64[{unit}]'),
+                          stoptime=trips.stoptime.values.astype(f'datetime64[{unit}]'))
+
+    expected = TripIndex.from_trips(trips)
+    index = TripIndex.from_trips(coarse)
+    for name in ['stations','dep_offsets','dep_times','arr_offsets','arr_times']:
+        np.testing.assert_array_equal(getattr(index, name), getattr(expected, name))
+
+    assert index.count(72, '2018-06-02', '2018-06-04') == \
+        ((trips.start_station_id == 72) & (trips.starttime >= '2018-06-02') & (trips.starttime < '2018-06-04')).sum()
+
+def resampled_net(trips, station_id, resample):
+    arrivals = trips.loc[trips.end_station_id == station_id].set_index('stoptime').resample(resample).size()
+    departures = trips.loc[trips.start_station_id == station_id].set_index('starttime').resample(resample).size()
+    return arrivals.sub(departures, fill_value=0).astype(np.int64).rename('net_bikes').rename_axis(None)
+
+@pytest.mark.parametrize('resample', ['15min','7min','60min'])
+def test_net_flow_matches_resample(trips, resample):
+    index = TripIndex.from_trips(trips)
+    for station_id in [72, 75]:
+        expected = resampled_net(trips, station_id, resample)
+        pd.testing.assert_series_equal(index.net_flow(station_id, resample), expected, check_freq=False)
+
+        interval = (str(expected.index[40]), str(expected.index[90]))
+        pd.testing.assert_series_equal(index.net_flow(station_id, resample, interval),
+                                       expected[interval[0]:interval[1]], check_freq=False)
+
+def test_net_counts_calendar_frequency(trips):
+    net = TripIndex.from_trips(trips).net_counts('W', [72, 75])
+    assert list(net.columns) == [72, 75]
+    expected = resampled_net(trips, 72, 'W')
+    pd.testing.assert_series_equal(net[72].reindex(expected.index), expected, check_names=False, check_freq=False)
+
+def test_save_swaps_in_new_version(trips, tmp_path):
+    path = str(tmp_path / 'trip_index')
+    TripIndex.from_trips(trips).save(path)
+    loaded = TripIndex.load(path)
+
+    TripIndex.from_trips(trips.head(10)).save(path)
+    assert len(loaded.dep_times) == len(trips)
+    assert len(TripIndex.load(path).dep_times) == 10